@@ -1,137 +1,681 @@
-from .auth import NfsnAuth
-from .nfsnbeanbag import NfsnBeanBag
-from beanbag.v2 import POST, GET, PUT
-import json
+from . import parallel
+from collections import OrderedDict
+from functools import partial
+import importlib
 import logging
 import os
-import requests
+import sys
+import threading
+import weakref
+
+try:
+    intern = sys.intern
+except AttributeError:
+    # Python 2
+    intern = intern
 
 __version__ = '1.1.1'
 
-logging.basicConfig(level=logging.WARNING)
 log = logging.getLogger('nfsn')
 
 API_ENDPOINT = 'https://api.nearlyfreespeech.net'
 
+# Names we export from our submodules (and beanbag.v2's verb functions, which
+# we used to export). We import each one the first time it is used, so that
+# "import nfsn" (and so every run of pynfsn) does not pay for importing
+# requests and beanbag until it makes an API call.
+_LAZY_NAMES = {
+    'GET': 'beanbag.v2',
+    'POST': 'beanbag.v2',
+    'PUT': 'beanbag.v2',
+    'ConnectionPool': 'pool',
+    'DirectTransport': 'transport',
+    'DnsBatch': 'dnsbatch',
+    'Metrics': 'metrics',
+    'NfsnAuth': 'auth',
+    'ResponseCache': 'cache',
+    'NfsnBeanBag': 'nfsnbeanbag',
+    'EmailForward': 'records',
+    'ResourceRecord': 'records',
+    'email_forwards': 'records',
+    'load_forwards': 'records',
+    'resource_records': 'records',
+    'RetryPolicy': 'retry',
+    'SingleFlight': 'singleflight',
+    'Snapshot': 'snapshot',
+    'Zone': 'zone',
+}
+
+
+def __getattr__(name):
+    """ Import a lazily-exported name (PEP 562). """
+    try:
+        module_name = _LAZY_NAMES[name]
+    except KeyError:
+        raise AttributeError("module %r has no attribute %r" %
+                             (__name__, name))
+    if not module_name.startswith('beanbag.'):
+        module_name = '.' + module_name
+    module = importlib.import_module(module_name, __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ support, so import everything now.
+    for _name in _LAZY_NAMES:
+        __getattr__(_name)
+
+# HTTP verbs for NfsnObject._request().
+_GET = 'GET'
+_POST = 'POST'
+_PUT = 'PUT'
+
+
+def _call(verb, base, path, body=None):
+    """ Make a request for a transport (a BeanBag base, or a
+    DirectTransport) and path, like beanbag.v2's verb functions (we do not
+    import beanbag.v2 here; see _LAZY_NAMES). """
+    return base.decode(base.make_request(path, verb, base.encode(body)))
+
+
+def credentials(login=None, api_key=None, login_file=None):
+    """ Return a (login, api_key) tuple.
+
+    Use the "login" and "api_key" strings if they were given, otherwise read
+    them from the JSON "login_file" (by default, "$HOME/.nfsn-api"). """
+    if (login is not None or api_key is not None):
+        if (login is None):
+            raise ValueError('specify a "login" arg when using "api_key".')
+        if (api_key is None):
+            raise ValueError('specify an "api_key" arg when using "login".')
+        return (login, api_key)
+    if (login_file is None):
+        login_file = os.path.join(os.environ['HOME'], '.nfsn-api')
+    import json
+    with open(login_file) as data_file:
+        data = json.load(data_file)
+    return (data['login'], data['api-key'])
+
+
 class Nfsn(object):
     """ Main NearlyFreeSpeech.net API object """
 
-    def __init__(self, login=None, api_key=None, login_file=None):
-        if (login is not None or api_key is not None):
-            if (login is None):
-                raise ValueError('specify a "login" arg when using "api_key".')
-            if (api_key is None):
-                raise ValueError('specify an "api_key" arg when using "login".')
-            self.login = login
-            self.api_key = api_key
+    # The number of recently used API objects (eg. nfsn.dns('example.com'))
+    # to keep, so that asking for the same one again is cheap.
+    max_handles = 256
+
+    def __init__(self, login=None, api_key=None, login_file=None,
+                 cache=None, rate_limiter=None, retry=None, metrics=None,
+                 endpoint=API_ENDPOINT, pool=None, coalesce=None,
+                 transport=None):
+        (self.login, self.api_key) = credentials(login, api_key, login_file)
+
+        # Optional ResponseCache. Pass cache=True for the default settings.
+        if cache is True:
+            from .cache import ResponseCache
+            cache = ResponseCache()
+        self.cache = cache
+
+        # Optional RetryPolicy. Pass retry=True for the default settings.
+        if retry is True:
+            from .retry import RetryPolicy
+            retry = RetryPolicy()
+        self.retry = retry
+
+        # Optional SingleFlight, to share identical reads that are in
+        # flight at the same time. Pass coalesce=True for the default.
+        if coalesce is True:
+            from .singleflight import SingleFlight
+            coalesce = SingleFlight()
+        self.coalesce = coalesce
+
+        # Optional Metrics. Pass metrics=True for the default settings.
+        if metrics is True:
+            from .metrics import Metrics
+            metrics = Metrics()
+        self.metrics = metrics
+
+        from .auth import NfsnAuth
+        from .nfsnbeanbag import NfsnBeanBag
+        # HTTP connections, which other Nfsn objects may share. Pass a
+        # ConnectionPool to set the pool size and timeouts.
+        if pool is None:
+            from .pool import ConnectionPool
+            pool = ConnectionPool()
+        self.pool = pool
+        # Optional nfsn.ratelimit.RateLimiter, shared by all the threads
+        # that use this object.
+        self.rate_limiter = rate_limiter
+        # The API's base URL. Override this to use a local stand-in server
+        # (see nfsn.mockserver).
+        self.endpoint = endpoint
+        # API objects by (class, id): the recently used ones, and weak
+        # references to every one still in use.
+        self._recent = OrderedDict()
+        self._handles = weakref.WeakValueDictionary()
+        self._handles_lock = threading.Lock()
+        auth = NfsnAuth(self.login, self.api_key)
+        self.beanbag = NfsnBeanBag(endpoint, session=pool.session,
+                                   rate_limiter=rate_limiter,
+                                   metrics=metrics, auth=auth,
+                                   timeout=pool.timeout)
+        # What the API objects make their requests with: the BeanBag base,
+        # or with transport='direct', a DirectTransport, which skips
+        # BeanBag's per-call overhead.
+        if transport is None or transport == 'beanbag':
+            (self.transport, _) = ~self.beanbag
+        elif transport == 'direct':
+            from .transport import DirectTransport
+            self.transport = DirectTransport(endpoint, pool.session,
+                                             rate_limiter=rate_limiter,
+                                             metrics=metrics, auth=auth,
+                                             timeout=pool.timeout)
         else:
-            if (login_file is None):
-                login_file = os.path.join(os.environ['HOME'], '.nfsn-api')
-            with open(login_file) as data_file:
-                data = json.load(data_file)
-            self.login = data['login']
-            self.api_key = data['api-key']
-
-        s = requests.Session()
-        s.auth = NfsnAuth(self.login, self.api_key)
-        self.beanbag = NfsnBeanBag(API_ENDPOINT, session=s)
+            raise ValueError('unknown transport: %r' % (transport,))
 
     def account(self, number):
-        return NfsnAccount(nfsn=self, number=number)
+        return self._handle(NfsnAccount, number)
 
     def dns(self, domain):
-        return NfsnDns(nfsn=self, domain=domain)
+        return self._handle(NfsnDns, domain)
 
     def email(self, domain):
-        return NfsnEmail(nfsn=self, domain=domain)
+        return self._handle(NfsnEmail, domain)
 
     def member(self, login):
-        return NfsnMember(nfsn=self, login=login)
+        return self._handle(NfsnMember, login)
 
     def site(self, name):
-        return NfsnSite(nfsn=self, name=name)
+        return self._handle(NfsnSite, name)
+
+    def _handle(self, cls, object_id):
+        """ Return the API object of class "cls" for "object_id", reusing
+        the existing one if there is one. """
+        key = (cls, object_id)
+        with self._handles_lock:
+            handle = self._recent.pop(key, None)
+            if handle is None:
+                handle = self._handles.get(key)
+            if handle is None:
+                handle = cls(self, object_id)
+                self._handles[key] = handle
+            self._recent[key] = handle
+            if len(self._recent) > self.max_handles:
+                self._recent.popitem(last=False)
+        return handle
+
+    def batch(self, calls, max_workers=parallel.MAX_WORKERS):
+        """ Run many API calls concurrently.
+
+        "calls" is a sequence of (key, function) pairs, where each function
+        takes no arguments. The calls share this object's HTTP session, and
+        at most "max_workers" of them run at once.
+
+        Returns an OrderedDict that maps each key to its function's result,
+        in the order of "calls". If a call raised an exception, its value is
+        the exception instead; the other calls still run. """
+        calls = list(calls)
+        outcomes = parallel.gather([call for (_, call) in calls], max_workers)
+        return OrderedDict(zip([key for (key, _) in calls], outcomes))
+
+    def map(self, object_name, ids, action, *args, **kwargs):
+        """ Run the same action for many objects concurrently.
+
+        For example, fetch the DNS records for several domains:
+
+        >>> nfsn.map('dns', ['example.com', 'example.net'], 'listRRs')
+
+        "action" is a property name (eg. "balance") or a method name (eg.
+        "listRRs"). Any extra arguments are passed to the method. Pass
+        "max_workers" as a keyword argument to bound the concurrency.
+
+        Returns an OrderedDict of results keyed by id; see batch(). """
+        max_workers = kwargs.pop('max_workers', parallel.MAX_WORKERS)
+        factory = getattr(self, object_name)
+        calls = [(object_id, partial(_invoke, factory, object_id, action,
+                                     args, kwargs))
+                 for object_id in ids]
+        return self.batch(calls, max_workers)
+
+    def snapshot(self, login, domains=(), email_domains=None,
+                 max_workers=parallel.MAX_WORKERS, previous=None):
+        """ Fetch an inventory of everything the member "login" has, running
+        up to "max_workers" calls at once: its accounts (with their balance,
+        friendly name, status and sites), its sites, and the DNS records and
+        email forwards of "domains".
+
+        The API cannot list a member's domains, so pass them in "domains".
+        Pass "email_domains" if they differ from the DNS domains.
+
+        Returns an nfsn.snapshot.Snapshot, which you can save() and load().
+        Calls that fail are left out, and listed in its "errors". With a
+        "previous" Snapshot, only fetch the records of zones whose serial
+        changed since then; see also Snapshot.refresh(). """
+        from .snapshot import crawl
+        return crawl(self, login, domains, email_domains, max_workers,
+                     previous)
+
+
+def _invoke(factory, object_id, action, args, kwargs):
+    """ Read a property or call a method on factory(object_id). """
+    result = getattr(factory(object_id), action)
+    if callable(result):
+        result = result(*args, **kwargs)
+    return result
 
 
 class NfsnObject(object):
+    """ Base class for the API objects. Reading an attribute GETs that
+    property from the API, and assigning an attribute PUTs it. """
+
+    # The API object type, eg. "dns". Subclasses set this.
+    object_name = None
+
+    def __init__(self, nfsn, object_id):
+        if type(object_id) is str:
+            object_id = intern(object_id)
+        object.__setattr__(self, 'nfsn', nfsn)
+        object.__setattr__(self, 'object_id', object_id)
+        # Build the request paths ourselves, rather than through a chain of
+        # BeanBag path objects for every call.
+        object.__setattr__(self, '_base', nfsn.transport)
+        prefix = '%s/%s/' % (self.object_name, str(object_id).lstrip('/'))
+        object.__setattr__(self, '_prefix', prefix)
+
+    @property
+    def beanbag(self):
+        """ The BeanBag URL for this object. """
+        return getattr(self.nfsn.beanbag, self.object_name)[self.object_id]
+
+    def _path(self, action):
+        """ The BeanBag path for an action, eg. ("dns/example.com/listRRs",
+        {}). """
+        return (self._prefix + action, {})
+
     def __getattr__(self, attr):
-        return GET(self.beanbag[attr])
+        return self._request(_GET, attr)
 
     def __setattr__(self, attr, value):
-        return PUT(self.beanbag[attr], value)
+        return self._request(_PUT, attr, value)
+
+    def _request(self, verb, action, body=None, check=None):
+        """ Call "action" (eg. "listRRs") with an HTTP verb (GET, POST or
+        PUT).
+
+        If the Nfsn object has a cache, serve GETs and list* POSTs from it,
+        and forget this object's cached responses after any other call. If
+        it has a SingleFlight, identical reads share one request.
+        "check" is for retrying changes; see RetryPolicy.call(). """
+        cache = self.nfsn.cache
+        coalesce = self.nfsn.coalesce
+        if cache is None and coalesce is None:
+            return self._send(verb, action, body, check)
+
+        if verb == _GET or (verb == _POST and action.startswith('list')):
+            params = tuple(sorted(body.items())) if body else ()
+            key = (self.object_name, self.object_id, action, params)
+            if cache is not None:
+                try:
+                    return cache.get(key)
+                except KeyError:
+                    pass
+            if coalesce is None:
+                result = self._send(verb, action, body)
+            else:
+                # Only the same request (including its method) can share a
+                # call.
+                result = coalesce.do(key + (verb,),
+                                     partial(self._send, verb, action, body))
+            if cache is not None:
+                cache.set(key, result)
+            return result
+
+        try:
+            return self._send(verb, action, body, check)
+        finally:
+            if cache is not None:
+                cache.invalidate(self.object_name, self.object_id)
+            if coalesce is not None:
+                coalesce.forget(self.object_name, self.object_id)
+
+    def _send(self, verb, action, body=None, check=None):
+        """ Make the HTTP request, retrying it if the Nfsn object has a
+        RetryPolicy. """
+        retry = self.nfsn.retry
+        if retry is None:
+            return _call(verb, self._base, self._path(action), body)
+        idempotent = (verb != _POST or action.startswith('list') or
+                      action in IDEMPOTENT_ACTIONS)
+        metrics = self.nfsn.metrics
+        if metrics is None:
+            return retry.call(partial(_call, verb, self._base,
+                                      self._path(action), body),
+                              idempotent=idempotent, check=check)
+
+        attempts = []
+        def attempt():
+            attempts.append(None)
+            return _call(verb, self._base, self._path(action), body)
+        try:
+            return retry.call(attempt, idempotent=idempotent, check=check)
+        finally:
+            if len(attempts) > 1:
+                metrics.retried(self.object_name, action, len(attempts) - 1)
+
+
+    def _stream(self, verb_name, action, body=None, pairs=False):
+        """ Iterate over a list result as it arrives; see
+        NfsnBeanBag.stream(). This bypasses the cache and the RetryPolicy.
+        """
+        return self._base.stream(self._path(action), verb_name, body,
+                                 pairs=pairs)
+
+
+# POST actions that are safe to repeat.
+IDEMPOTENT_ACTIONS = ('updateSerial',)
 
 
 class NfsnAccount(NfsnObject):
+    object_name = 'account'
+
     def __init__(self, nfsn, number):
-        object.__setattr__(self, 'beanbag', nfsn.beanbag.account[number])
+        super(NfsnAccount, self).__init__(nfsn, number)
 
     def addSite(self, site):
-        return POST(self.beanbag.addSite, {'site': site})
+        return self._request(_POST, 'addSite', {'site': site})
 
     def addWarning(self, balance):
-        return POST(self.beanbag.addWarning, {'balance': balance})
+        return self._request(_POST, 'addWarning', {'balance': balance})
 
     def removeWarning(self, balance):
-        return POST(self.beanbag.removeWarning, {'balance': balance})
+        return self._request(_POST, 'removeWarning', {'balance': balance})
+
+    def iter_sites(self):
+        """ Yield the account's site names one by one, like "sites". """
+        return self._stream(_GET, 'sites')
 
 
 class NfsnDns(NfsnObject):
 
+    object_name = 'dns'
+
     def __init__(self, nfsn, domain):
-        object.__setattr__(self, 'beanbag', nfsn.beanbag.dns[domain])
+        super(NfsnDns, self).__init__(nfsn, domain)
 
     def addRR(self, name, type, data, ttl=None):
         payload = {'name': name, 'type': type, 'data': data}
         if ttl is not None:
             payload['ttl'] = ttl
-        return POST(self.beanbag.addRR, payload)
-
-    def listRRs(self, name=None, type=None, data=None):
-        payload = {}
-        if name is not None:
-            payload['name'] = name
-        if type is not None:
-            payload['type'] = type
-        if data is not None:
-            payload['data'] = data
-        return POST(self.beanbag.listRRs, payload)
+        check = partial(self._has_rr, name, type, data)
+        return self._request(_POST, 'addRR', payload, check=check)
+
+    def listRRs(self, name=None, type=None, data=None, as_records=False):
+        """ List the DNS resource records, optionally filtered by name,
+        type, or data. With as_records=True, return a list of
+        ResourceRecords instead of an AttrDict. """
+        payload = _rr_filter(name, type, data)
+        result = self._request(_POST, 'listRRs', payload)
+        if as_records:
+            from .records import resource_records
+            return resource_records(result)
+        return result
+
+    def iter_rrs(self, name=None, type=None, data=None, as_records=False):
+        """ Like listRRs(), but yield each record (a dict, or a
+        ResourceRecord) as it is parsed, so that even very large zones use
+        constant memory. """
+        from .records import ResourceRecord
+        payload = _rr_filter(name, type, data)
+        for rr in self._stream(_POST, 'listRRs', payload):
+            if as_records:
+                rr = ResourceRecord.from_dict(rr)
+            yield rr
 
     def removeRR(self, name, type, data):
         payload = {'name': name, 'type': type, 'data': data}
-        return POST(self.beanbag.removeRR, payload)
+        check = lambda: not self._has_rr(name, type, data)
+        return self._request(_POST, 'removeRR', payload, check=check)
+
+    def _has_rr(self, name, type, data):
+        """ Ask NFSN (bypassing any cache) whether a record exists. """
+        payload = {'name': name, 'type': type, 'data': data}
+        for rr in self._send(_POST, 'listRRs', payload):
+            if _rr_id(rr) == (name, type, data):
+                return True
+        return False
 
     def updateSerial(self):
-        return POST(self.beanbag.updateSerial)
+        return self._request(_POST, 'updateSerial')
+
+    def zone(self):
+        """ Fetch all the records into an indexed Zone object. """
+        from .zone import Zone
+        return Zone.from_dns(self)
+
+    def batch(self, max_workers=parallel.MAX_WORKERS):
+        """ Return a DnsBatch, to queue record changes and make them
+        concurrently, with one updateSerial() at the end. """
+        from .dnsbatch import DnsBatch
+        return DnsBatch(self, max_workers)
+
+    def sync(self, desired, max_workers=parallel.MAX_WORKERS, dry_run=False):
+        """ Make this zone's records match the "desired" records.
+
+        "desired" is a list of dicts with "name", "type", "data" and
+        (optionally) "ttl" keys, like the ones listRRs() returns, or a list
+        of ResourceRecords. We fetch
+        the current records once, remove the records that are not desired,
+        add the missing ones, and update the serial once at the end. The
+        removals run concurrently, then the additions, so a record whose TTL
+        changed is removed before it is re-added. NFSN's own "system"
+        records are never removed.
+
+        Returns a dict of the "removed" and "added" records. With
+        dry_run=True, only compute these changes. """
+        (remove, add) = diff_rrs(self.listRRs(), desired)
+        if dry_run:
+            return {'removed': remove, 'added': add}
+
+        with self.batch(max_workers) as batch:
+            for rr in map(_rr_dict, remove):
+                batch.remove(rr['name'], rr['type'], rr['data'])
+            for rr in map(_rr_dict, add):
+                batch.add(rr['name'], rr['type'], rr['data'], _rr_ttl(rr))
+        return {'removed': remove, 'added': add}
+
+
+def _rr_filter(name=None, type=None, data=None):
+    """ Build the listRRs payload. """
+    payload = {}
+    if name is not None:
+        payload['name'] = name
+    if type is not None:
+        payload['type'] = type
+    if data is not None:
+        payload['data'] = data
+    return payload
+
+
+def _rr_dict(rr):
+    if isinstance(rr, tuple):
+        # A ResourceRecord
+        return rr.to_dict()
+    return rr
+
+
+def _rr_id(rr):
+    return (rr['name'], rr['type'], rr['data'])
+
+
+def _rr_ttl(rr):
+    """ Return a record's TTL as a string, or None if it has none. """
+    if 'ttl' not in rr or rr['ttl'] is None:
+        return None
+    return str(rr['ttl'])
+
+
+def _rr_is_system(rr):
+    return 'scope' in rr and rr['scope'] == 'system'
+
+
+def diff_rrs(current, desired):
+    """ Compare two lists of DNS resource records (dicts or
+    ResourceRecords), keyed on (name, type, data, ttl).
+
+    Return a (remove, add) tuple of record lists that turn "current" into
+    "desired". A desired record without a "ttl" matches a current record
+    with any TTL. System records are never in the "remove" list. """
+    current = [(rr, _rr_dict(rr)) for rr in current]
+    existing = dict((_rr_id(fields), (rr, fields))
+                    for (rr, fields) in current)
+    wanted = set()
+    remove = []
+    add = []
+    for rr in desired:
+        fields = _rr_dict(rr)
+        rr_id = _rr_id(fields)
+        if rr_id in wanted:
+            continue
+        wanted.add(rr_id)
+        if rr_id not in existing:
+            add.append(rr)
+            continue
+        (have, have_fields) = existing[rr_id]
+        ttl = _rr_ttl(fields)
+        if ttl is not None and ttl != _rr_ttl(have_fields):
+            if not _rr_is_system(have_fields):
+                remove.append(have)
+                add.append(rr)
+    for (rr, fields) in current:
+        if _rr_id(fields) not in wanted and not _rr_is_system(fields):
+            remove.append(rr)
+    return (remove, add)
+
+
+def diff_forwards(current, desired):
+    """ Compare two sets of email forwards: dicts of forward -> dest_email,
+    or lists of (forward, dest_email) pairs.
+
+    Return a (remove, set) tuple: a list of the forwards in "current" that
+    are not in "desired", and an OrderedDict of the forwards to set (new or
+    changed) to turn "current" into "desired". """
+    existing = OrderedDict(_forward_pairs(current))
+    wanted = OrderedDict(_forward_pairs(desired))
+    remove = [forward for forward in existing if forward not in wanted]
+    set_ = OrderedDict((forward, dest_email)
+                       for (forward, dest_email) in wanted.items()
+                       if existing.get(forward) != dest_email)
+    return (remove, set_)
+
+
+def _forward_pairs(forwards):
+    if isinstance(forwards, dict):
+        return forwards.items()
+    return forwards
 
 
 class NfsnEmail(NfsnObject):
 
-    def __init__(self, nfsn, domain):
-        object.__setattr__(self, 'beanbag', nfsn.beanbag.email[domain])
+    object_name = 'email'
 
-    def listForwards(self):
-        return POST(self.beanbag.listForwards)
+    def __init__(self, nfsn, domain):
+        super(NfsnEmail, self).__init__(nfsn, domain)
+
+    def listForwards(self, as_records=False):
+        """ List the email forwards. With as_records=True, return a list
+        of EmailForwards instead of an AttrDict. """
+        result = self._request(_POST, 'listForwards')
+        if as_records:
+            from .records import email_forwards
+            return email_forwards(result)
+        return result
+
+    def iter_forwards(self, as_records=False):
+        """ Like listForwards(), but yield each (forward, dest_email) pair
+        (or EmailForward) as it is parsed. """
+        from .records import EmailForward
+        for (forward, dest_email) in self._stream(_POST, 'listForwards',
+                                                  pairs=True):
+            if as_records:
+                yield EmailForward(forward, dest_email)
+            else:
+                yield (forward, dest_email)
 
     def removeForward(self, forward):
-        return POST(self.beanbag.removeForward, {'forward': forward})
+        check = lambda: self._forward_to(forward) is None
+        return self._request(_POST, 'removeForward', {'forward': forward},
+                             check=check)
 
     def setForward(self, forward, dest_email):
         payload = {'forward': forward, 'dest_email': dest_email}
-        return POST(self.beanbag.setForward, payload)
+        check = lambda: self._forward_to(forward) == dest_email
+        return self._request(_POST, 'setForward', payload, check=check)
+
+    def sync_forwards(self, desired, max_workers=parallel.MAX_WORKERS,
+                      dry_run=False, prune=True):
+        """ Make this domain's forwards match the "desired" forwards.
+
+        "desired" is a dict of forward -> dest_email (like listForwards()
+        returns), or a list of (forward, dest_email) pairs or EmailForwards
+        (like load_forwards() returns). We fetch the current forwards once,
+        then concurrently set the new and changed forwards and remove the
+        forwards that are not desired. With prune=False, leave undesired
+        forwards alone.
+
+        Returns a dict of the forwards we "removed" (a list), the forwards
+        we "set" (a dict of forward -> dest_email), and the "errors" (a dict
+        of forward -> exception) for the changes that failed; the others are
+        still made. With dry_run=True, only compute the changes. """
+        (remove, set_) = diff_forwards(self.listForwards(as_records=True),
+                                       desired)
+        if not prune:
+            remove = []
+        result = {'removed': remove, 'set': set_, 'errors': {}}
+        if dry_run:
+            return result
+
+        forwards = remove + list(set_)
+        calls = [partial(self.removeForward, forward) for forward in remove]
+        calls += [partial(self.setForward, forward, dest_email)
+                  for (forward, dest_email) in set_.items()]
+        outcomes = parallel.gather(calls, max_workers)
+        for (forward, outcome) in zip(forwards, outcomes):
+            if isinstance(outcome, Exception):
+                result['errors'][forward] = outcome
+        return result
+
+    def _forward_to(self, forward):
+        """ Ask NFSN (bypassing any cache) where a forward goes, or return
+        None if it does not exist. """
+        forwards = self._send(_POST, 'listForwards')
+        if forward in forwards:
+            return forwards[forward]
+        return None
 
 
 class NfsnMember(NfsnObject):
 
+    object_name = 'member'
+
     def __init__(self, nfsn, login):
-        object.__setattr__(self, 'beanbag', nfsn.beanbag.member[login])
+        super(NfsnMember, self).__init__(nfsn, login)
+
+    def iter_sites(self):
+        """ Yield the member's site names one by one, like "sites". """
+        return self._stream(_GET, 'sites')
 
 
 class NfsnSite(NfsnObject):
 
+    object_name = 'site'
+
     def __init__(self, nfsn, name):
-        object.__setattr__(self, 'beanbag', nfsn.beanbag.site[name])
+        super(NfsnSite, self).__init__(nfsn, name)
 
     def addAlias(self, alias):
-        return POST(self.beanbag.addAlias, {'alias': alias})
+        return self._request(_POST, 'addAlias', {'alias': alias})
 
     def removeAlias(self, alias):
-        return POST(self.beanbag.removeAlias, {'alias': alias})
+        return self._request(_POST, 'removeAlias', {'alias': alias})
@@ -0,0 +1,215 @@
+""" asyncio support for the NearlyFreeSpeech.net API.
+
+This module requires Python 3.5+ and the "aiohttp" package. It is not
+imported by the main "nfsn" package, so import it explicitly:
+
+    >>> from nfsn.aio import AsyncNfsn
+    >>> async with AsyncNfsn() as nfsn:
+    ...     rrs = await nfsn.dns('example.com').listRRs()
+"""
+from . import API_ENDPOINT, credentials
+from .auth import NfsnAuth
+from .nfsnbeanbag import check_content_type, loads
+from beanbag.attrdict import AttrDict
+from beanbag.v2 import BeanBagException
+import logging
+from urllib.parse import urlencode, urlsplit
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+log = logging.getLogger(__name__)
+
+
+class AsyncNfsn(object):
+    """ asyncio NearlyFreeSpeech.net API object
+
+    All the API objects share one pooled aiohttp session. Use this as an
+    "async with" context manager, or await close() when you are done. """
+
+    def __init__(self, login=None, api_key=None, login_file=None,
+                 endpoint=API_ENDPOINT, limit=100):
+        if aiohttp is None:
+            raise ImportError('AsyncNfsn requires the "aiohttp" package.')
+        (self.login, self.api_key) = credentials(login, api_key, login_file)
+        self.auth = NfsnAuth(self.login, self.api_key)
+        self.endpoint = endpoint.rstrip('/')
+        # The path that we sign is this (eg. "/api", or "") plus the path
+        # for the call.
+        self._base_path = urlsplit(self.endpoint).path
+        # Maximum number of simultaneous connections in the pool.
+        self.limit = limit
+        self._session = None
+
+    @property
+    def session(self):
+        """ The shared aiohttp session. aiohttp wants this created from
+        within a running event loop, so we create it on first use. """
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def request(self, method, path, data=None):
+        """ Make a signed HTTP request for "path" (eg.
+        "/dns/example.com/listRRs") and return the decoded response. """
+        if data is None:
+            body = ''
+        elif isinstance(data, dict):
+            body = urlencode(data)
+        else:
+            body = str(data)
+        headers = {
+            'Accept': 'application/json',
+            'X-NFSN-Authentication': self.auth.header(
+                self._base_path + path, body),
+        }
+        if isinstance(data, dict):
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        url = self.endpoint + path
+        async with self.session.request(method, url, headers=headers,
+                                        data=body.encode('utf-8')) as r:
+            content = await r.read()
+        return decode(r, content)
+
+    def account(self, number):
+        return AsyncNfsnAccount(nfsn=self, object_id=number)
+
+    def dns(self, domain):
+        return AsyncNfsnDns(nfsn=self, object_id=domain)
+
+    def email(self, domain):
+        return AsyncNfsnEmail(nfsn=self, object_id=domain)
+
+    def member(self, login):
+        return AsyncNfsnMember(nfsn=self, object_id=login)
+
+    def site(self, name):
+        return AsyncNfsnSite(nfsn=self, object_id=name)
+
+
+def decode(response, content):
+    """ Decode an aiohttp response body the same way NfsnBeanBag does. """
+    if response.status == 401:
+        log.error(content)
+        raise RuntimeError('Could not authenticate with login/key.')
+    if response.status < 200 or response.status >= 300:
+        log.error(response.headers)
+        log.error(content)
+        raise BeanBagException(response,
+                               'Bad response code: %d' % response.status)
+    # NFSN sometimes returns simple strings rather than JSON.
+    try:
+        obj = loads(content)
+    except ValueError:
+        return content.decode('utf-8')
+    check_content_type(response, content)
+    if isinstance(obj, (dict, list)):
+        obj = AttrDict(obj)
+    return obj
+
+
+class AsyncNfsnObject(object):
+    """ Properties are coroutines: "await nfsn.dns('example.com').serial".
+    Since assignment cannot be awaited, use "await obj.set(attr, value)"
+    to change a property. """
+
+    object_name = None
+
+    def __init__(self, nfsn, object_id):
+        self.nfsn = nfsn
+        self.path = '/%s/%s/' % (self.object_name, object_id)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return self.get(attr)
+
+    def get(self, attr):
+        return self.nfsn.request('GET', self.path + attr)
+
+    def set(self, attr, value):
+        return self.nfsn.request('PUT', self.path + attr, value)
+
+    def post(self, action, payload=None):
+        return self.nfsn.request('POST', self.path + action, payload)
+
+
+class AsyncNfsnAccount(AsyncNfsnObject):
+    object_name = 'account'
+
+    async def addSite(self, site):
+        return await self.post('addSite', {'site': site})
+
+    async def addWarning(self, balance):
+        return await self.post('addWarning', {'balance': balance})
+
+    async def removeWarning(self, balance):
+        return await self.post('removeWarning', {'balance': balance})
+
+
+class AsyncNfsnDns(AsyncNfsnObject):
+    object_name = 'dns'
+
+    async def addRR(self, name, type, data, ttl=None):
+        payload = {'name': name, 'type': type, 'data': data}
+        if ttl is not None:
+            payload['ttl'] = ttl
+        return await self.post('addRR', payload)
+
+    async def listRRs(self, name=None, type=None, data=None):
+        payload = {}
+        if name is not None:
+            payload['name'] = name
+        if type is not None:
+            payload['type'] = type
+        if data is not None:
+            payload['data'] = data
+        return await self.post('listRRs', payload)
+
+    async def removeRR(self, name, type, data):
+        payload = {'name': name, 'type': type, 'data': data}
+        return await self.post('removeRR', payload)
+
+    async def updateSerial(self):
+        return await self.post('updateSerial')
+
+
+class AsyncNfsnEmail(AsyncNfsnObject):
+    object_name = 'email'
+
+    async def listForwards(self):
+        return await self.post('listForwards')
+
+    async def removeForward(self, forward):
+        return await self.post('removeForward', {'forward': forward})
+
+    async def setForward(self, forward, dest_email):
+        payload = {'forward': forward, 'dest_email': dest_email}
+        return await self.post('setForward', payload)
+
+
+class AsyncNfsnMember(AsyncNfsnObject):
+    object_name = 'member'
+
+
+class AsyncNfsnSite(AsyncNfsnObject):
+    object_name = 'site'
+
+    async def addAlias(self, alias):
+        return await self.post('addAlias', {'alias': alias})
+
+    async def removeAlias(self, alias):
+        return await self.post('removeAlias', {'alias': alias})
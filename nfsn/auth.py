@@ -1,18 +1,29 @@
 import hashlib
 import logging
-import random
+import os
 import requests
 import string
 import time
 try:
-    from urllib.parse import urlparse
+    from urllib.parse import urlsplit
 except ImportError:
     # Python 2
-    from urlparse import urlparse
+    from urlparse import urlsplit
 
-logging.basicConfig(level=logging.WARNING)
 log = logging.getLogger(__name__)
 
+_SALT_CHARACTERS = string.ascii_letters + string.digits
+
+# Translation table from random bytes to salt characters. The 62 characters
+# fit into the first 248 byte values four times over, and we drop the last 8
+# values so that every character is equally likely.
+_SALT_TABLE = bytes(bytearray(
+    ord(_SALT_CHARACTERS[i % len(_SALT_CHARACTERS)]) for i in range(256)))
+_SALT_REJECT = bytes(bytearray(range(248, 256)))
+
+# SHA-1 of an empty request body (eg. for every GET)
+_EMPTY_BODY_HASH = hashlib.sha1(b'').hexdigest()
+
 class NfsnAuth(requests.auth.AuthBase):
     """Helper class for NearlyFreeSpeech authentication using requests
        library.
@@ -21,7 +32,7 @@ class NfsnAuth(requests.auth.AuthBase):
        >>> s.auth = NfsnAuth('myusername', 'myapikey1234')
        >>> nfsn = NfsnBeanbag('https://api.nearlyfreespeech.net', session=s)
     """
-    SALT_CHARACTERS = string.ascii_letters + string.digits
+    SALT_CHARACTERS = _SALT_CHARACTERS
 
     def __init__(self, login, api_key):
         self.login = login
@@ -34,8 +45,6 @@ class NfsnAuth(requests.auth.AuthBase):
         more explanation. """
 
         header = self._header(r)
-        log.debug("X-NFSN-Authentication header: %s", header)
-
         r.headers['X-NFSN-Authentication'] = header
         return r
 
@@ -43,37 +52,47 @@ class NfsnAuth(requests.auth.AuthBase):
         """ Build the contents of the X-NFSN-Authentication HTTP header. See
         https://members.nearlyfreespeech.net/wiki/API/Introduction for
         more explanation. """
+        return self.header(urlsplit(r.url).path, r.body)
+
+    def header(self, request_uri, body=None):
+        """ Build the contents of the X-NFSN-Authentication HTTP header for
+        a request to "request_uri" (eg. "/dns/example.com/listRRs") with the
+        given request body. This does not depend on any particular HTTP
+        library, so other transports can sign their requests too. """
         login = self.login
         timestamp = self._timestamp()
         salt = self._salt()
-        api_key = self.api_key
-        request_uri = urlparse(r.url).path
-        body = ''.encode('utf-8')
-        if r.body:
-            body = r.body.encode('utf-8')
-        body_hash = hashlib.sha1(body).hexdigest()
-
-        log.debug("login: %s", login)
-        log.debug("timestamp: %s", timestamp)
-        log.debug("salt: %s", salt)
-        log.debug("api_key: %s", api_key)
-        log.debug("request_uri: %s", request_uri)
-        log.debug("body_hash: %s", body_hash)
+        if body:
+            if not isinstance(body, bytes):
+                body = body.encode('utf-8')
+            body_hash = hashlib.sha1(body).hexdigest()
+        else:
+            body_hash = _EMPTY_BODY_HASH
 
-        string = ';'.join((login, timestamp, salt, api_key, request_uri, body_hash))
-        log.debug("string to be hashed: %s", string)
+        string = ';'.join((login, timestamp, salt, self.api_key, request_uri,
+                           body_hash))
         string_hash = hashlib.sha1(string.encode('utf-8')).hexdigest()
-        log.debug("string_hash: %s", string_hash)
-
-        return ';'.join((login, timestamp, salt, string_hash))
+        header = ';'.join((login, timestamp, salt, string_hash))
 
+        if log.isEnabledFor(logging.DEBUG):
+            # Never log the API key (or the string that contains it).
+            log.debug("request_uri: %s, body_hash: %s", request_uri,
+                      body_hash)
+            log.debug("X-NFSN-Authentication header: %s", header)
+        return header
 
     def _salt(self):
-        """ Return a 16-character alphanumeric string. """
-        return ''.join(random.SystemRandom().choice(self.SALT_CHARACTERS) for _ in range(16))
+        """ Return a 16-character alphanumeric string, from a single read
+        of the operating system's cryptographically secure random source.
+        """
+        salt = b''
+        while len(salt) < 16:
+            # 24 random bytes almost always leave at least 16 after
+            # dropping the rejected values.
+            salt += os.urandom(24).translate(_SALT_TABLE, _SALT_REJECT)
+        return salt[:16].decode('ascii')
 
     def _timestamp(self):
         """ Return the current number of seconds since the Unix epoch,
         as a string. """
         return str(int(time.time()))
-
@@ -0,0 +1,159 @@
+""" Caches for API responses. """
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+
+class ResponseCache(object):
+    """ A size-bounded LRU cache of decoded API responses, with an expiry
+    time (TTL) for each object type.
+
+    Keys are (object_name, object_id, action, params) tuples, eg. ('dns',
+    'example.com', 'listRRs', ()). The cache is safe to share between
+    threads.
+
+    Every cache hit returns the same response object (eg. the AttrDict
+    from listRRs()), so do not change it in place.
+
+    :Example:
+    >>> cache = ResponseCache(ttl=60, ttls={'dns': 300}, max_size=1000)
+    >>> nfsn = Nfsn(cache=cache)
+    """
+
+    def __init__(self, ttl=60, ttls=None, max_size=1024):
+        # Default number of seconds to keep a response.
+        self.ttl = ttl
+        # Number of seconds to keep a response, per object type. Eg.
+        # {'account': 30, 'dns': 300}
+        self.ttls = ttls or {}
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Return the cached response for "key", or raise KeyError if it is
+        missing or expired. """
+        with self._lock:
+            (expires, value) = self._entries.pop(key)
+            if expires < time.time():
+                raise KeyError(key)
+            # Re-insert to mark this as the most recently used entry.
+            self._entries[key] = (expires, value)
+            return value
+
+    def expires(self, key):
+        """ Return the time when a response for "key" set now expires. """
+        return time.time() + self.ttls.get(key[0], self.ttl)
+
+    def set(self, key, value):
+        expires = self.expires(key)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, object_name, object_id):
+        """ Forget all the responses for one API object. """
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == object_name and key[1] == object_id:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def default_cache_path():
+    """ Return the default DiskCache file path, under $XDG_CACHE_HOME (or
+    ~/.cache). """
+    cache_home = os.environ.get('XDG_CACHE_HOME')
+    if not cache_home:
+        cache_home = os.path.join(os.environ['HOME'], '.cache')
+    return os.path.join(cache_home, 'nfsn', 'responses.sqlite')
+
+
+class DiskCache(ResponseCache):
+    """ A ResponseCache stored in a SQLite file, so that separate processes
+    (eg. many "pynfsn" runs) can share it.
+
+    Responses are stored as JSON. With refresh=True, never return cached
+    responses, but still store new ones. """
+
+    def __init__(self, path=None, ttl=60, ttls=None, max_size=10000,
+                 refresh=False):
+        super(DiskCache, self).__init__(ttl=ttl, ttls=ttls,
+                                        max_size=max_size)
+        if path is None:
+            path = default_cache_path()
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.refresh = refresh
+        # Imported here so that "pynfsn --help" need not load sqlite3.
+        import sqlite3
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY,'
+                ' object_name TEXT,'
+                ' object_id TEXT,'
+                ' expires REAL,'
+                ' value TEXT)')
+
+    def get(self, key):
+        from beanbag.attrdict import AttrDict
+        if self.refresh:
+            raise KeyError(key)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value FROM responses WHERE key = ? AND expires >= ?',
+                (json.dumps(key), time.time())).fetchone()
+        if row is None:
+            raise KeyError(key)
+        value = json.loads(row[0])
+        if isinstance(value, dict) or isinstance(value, list):
+            value = AttrDict(value)
+        return value
+
+    def set(self, key, value):
+        from beanbag.attrdict import AttrDict
+        if isinstance(value, AttrDict):
+            value = +value
+        row = (json.dumps(key), key[0], key[1], self.expires(key),
+               json.dumps(value))
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses WHERE expires < ?',
+                             (time.time(),))
+            self._db.execute('INSERT OR REPLACE INTO responses'
+                             ' VALUES (?, ?, ?, ?, ?)', row)
+            self._db.execute(
+                'DELETE FROM responses WHERE key NOT IN (SELECT key FROM'
+                ' responses ORDER BY expires DESC LIMIT ?)',
+                (self.max_size,))
+
+    def invalidate(self, object_name, object_id):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses'
+                             ' WHERE object_name = ? AND object_id = ?',
+                             (object_name, object_id))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses')
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()[0]
@@ -1,6 +1,10 @@
 import os
 import sys
 import nfsn
+from nfsn import parallel
+
+# pynfsn runs very often (eg. from monitoring scripts), so we only import
+# json, requests, beanbag etc. once we know we will make an API call.
 
 _help = """%(prog)s: Interact with the NearlyFreeSpeech.net API.
 Version: %(version)s
@@ -10,6 +14,16 @@ Sub Commands:
     email     Get information about a NFSN email domain
     member    Get information about a NFSN member login
     site      Get information about a NFSN site
+Options (before the sub command):
+    --no-cache        Do not read or store responses in the on-disk cache
+    --refresh         Ignore cached responses, but store the new ones
+    --jobs N, -j N    Run up to N commands at once (default: %(jobs)s)
+    --commands FILE   Run each "object_name object_id object_action [args]"
+                      line in FILE ("-" for stdin)
+Responses to reads are cached for %(ttl)s seconds in %(cache_path)s
+To run a command for several ids, separate the ids with commas, or use "-"
+to read the ids from stdin, one per line. With several commands, each
+result is printed as a line of JSON.
 Examples:
   List all the accounts for "myusername":
     %(prog)s member myusername accounts
@@ -34,10 +48,116 @@ Examples:
 
   Remove a DNS record:
     %(prog)s dns example.com removeRR testing A 192.0.2.2
+
+  Show the DNS resource records for many domains, eight at a time:
+    %(prog)s --jobs 8 dns - listRRs < domains.txt
 """
 
 def print_help(prog_name):
-    print(_help % {'prog': prog_name, 'version': nfsn.__version__})
+    print(_help % {'prog': prog_name, 'version': nfsn.__version__,
+                   'ttl': CACHE_TTL, 'cache_path': _cache_path(),
+                   'jobs': parallel.MAX_WORKERS})
+
+# Number of seconds to keep responses in the on-disk cache.
+CACHE_TTL = 60
+
+def _cache_path():
+    from nfsn.cache import default_cache_path
+    try:
+        return default_cache_path()
+    except KeyError:
+        # No $HOME
+        return 'the user cache directory'
+
+def _parse_options(args):
+    """ Split the options out of the command-line arguments. Return an
+    (options, remaining arguments) tuple. Options come first: we stop at
+    "--" or the first other argument, so that the action's own arguments
+    (eg. TXT data) can look like options. """
+    options = {'cache': True, 'refresh': False,
+               'jobs': parallel.MAX_WORKERS, 'commands': None}
+    remaining = []
+    args = iter(args)
+    for arg in args:
+        if arg == '--':
+            remaining = list(args)
+        elif arg == '--no-cache':
+            options['cache'] = False
+        elif arg == '--refresh':
+            options['refresh'] = True
+        elif arg in ('--jobs', '-j', '--commands'):
+            name = 'commands' if arg == '--commands' else 'jobs'
+            try:
+                options[name] = next(args)
+            except StopIteration:
+                raise SystemExit('%s needs a value' % arg)
+        elif arg.startswith('--jobs='):
+            options['jobs'] = arg.split('=', 1)[1]
+        elif arg.startswith('--commands='):
+            options['commands'] = arg.split('=', 1)[1]
+        else:
+            remaining = [arg] + list(args)
+    try:
+        options['jobs'] = int(options['jobs'])
+    except ValueError:
+        raise SystemExit('--jobs must be a number')
+    return (options, remaining)
+
+def _read_lines(filename):
+    """ Return the non-blank, non-comment lines of a file, or of stdin if
+    filename is "-". """
+    if filename == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(filename) as data_file:
+            lines = data_file.readlines()
+    lines = [line.strip() for line in lines]
+    return [line for line in lines if line and not line.startswith('#')]
+
+def _commands(args, commands_file):
+    """ Return a list of (object_name, object_id, object_action, args)
+    tuples to run. """
+    import shlex
+    commands = []
+    if commands_file is not None:
+        for line in _read_lines(commands_file):
+            words = shlex.split(line)
+            if len(words) < 3:
+                raise SystemExit('bad command: %s' % line)
+            commands.append((words[0], words[1], words[2], words[3:]))
+    if args:
+        if len(args) < 3:
+            raise SystemExit('usage: object_name object_id object_action'
+                             ' [args...]')
+        (object_name, object_id, object_action) = args[:3]
+        if object_id == '-':
+            ids = _read_lines('-')
+        else:
+            ids = [i for i in object_id.split(',') if i]
+        for i in ids:
+            commands.append((object_name, i, object_action, args[3:]))
+    return commands
+
+def _run(n, command):
+    """ Run one command and return the result. """
+    (object_name, object_id, object_action, action_args) = command
+    factory = getattr(n, object_name)
+    return nfsn._invoke(factory, object_id, object_action, action_args, {})
+
+def _json_line(command, outcome):
+    """ Format one command's result (or exception) as a line of JSON. """
+    import json
+    from beanbag.attrdict import AttrDict
+    (object_name, object_id, object_action, _) = command
+    line = {'object': object_name, 'id': object_id,
+            'action': object_action}
+    if isinstance(outcome, Exception):
+        line['error'] = str(outcome)
+    else:
+        if isinstance(outcome, AttrDict):
+            outcome = +outcome
+        line['result'] = outcome
+    return json.dumps(line, sort_keys=True)
 
 def main(argv=None):
 
@@ -46,31 +166,41 @@ def main(argv=None):
 
     prog_name = os.path.basename(argv[0])
 
-    if len(argv) <= 3:
-        return print_help(prog_name)
+    (options, args) = _parse_options(argv[1:])
 
-    n = nfsn.Nfsn()
+    if len(args) < 3 and options['commands'] is None:
+        return print_help(prog_name)
 
     # The HTTP call will look something like this:
     # https://api.nearlyfreespeech.net/object_name/object_id/object_action
     # where "object_name" is "dns", "email", etc.
     #       "object_id" is "example.com", "myusername", etc.
     #       "object_action" is "listRRs", "status", etc.
+    commands = _commands(args, options['commands'])
 
-    (object_name, object_id, object_action) = argv[1:4]
-    action_args = argv[4:]
+    import logging
+    from functools import partial
+    from nfsn.cache import DiskCache
+    logging.basicConfig(level=logging.WARNING)
 
-    obj = getattr(n, object_name)(object_id)
-
-    myproperty = getattr(obj, object_action)
-
-    if callable(myproperty):
-        result = myproperty(*action_args)
-    else:
-        result = myproperty
-
-    if isinstance(result, dict):
-        # AttrDict from Beanbag
-        print(+result)
-    else:
-        print(result)
+    n = nfsn.Nfsn()
+    if options['cache']:
+        n.cache = DiskCache(ttl=CACHE_TTL, refresh=options['refresh'])
+
+    if len(commands) == 1 and options['commands'] is None:
+        result = _run(n, commands[0])
+        if isinstance(result, dict):
+            # AttrDict from Beanbag
+            print(+result)
+        else:
+            print(result)
+        return
+
+    # Several commands: run them concurrently over the one session, and
+    # print a line of JSON for each, in order.
+    calls = [partial(_run, n, command) for command in commands]
+    outcomes = parallel.gather(calls, options['jobs'])
+    for (command, outcome) in zip(commands, outcomes):
+        print(_json_line(command, outcome))
+    if parallel.first_error(outcomes) is not None:
+        return 1
@@ -0,0 +1,124 @@
+""" Queue changes to a DNS zone, and make them all at once. """
+from . import _POST, _rr_id, _rr_ttl, parallel
+from collections import namedtuple, OrderedDict
+from functools import partial
+
+
+class Operation(namedtuple('Operation', 'action name type data ttl')):
+    """ One queued change: "action" is "removeRR" or "addRR". """
+    __slots__ = ()
+
+
+class DnsBatch(object):
+    """ A batch of record additions and removals for one zone.
+
+    Queue changes with add() and remove(); submit() (or leaving the "with"
+    block) makes them concurrently, removals first, then updates the serial
+    once. Duplicate changes are only made once, and the last change queued
+    for a record wins: removing a record drops a queued add() of it, and
+    adding a record after removing it re-adds it. When that leaves it
+    unclear whether a change is needed, submit() lists the zone's records
+    once, and skips removing records that do not exist, and removing and
+    re-adding records that already have the same TTL. If the "with" block
+    raises an exception, nothing is submitted.
+
+    After submitting, "results" is a list of (Operation, outcome) pairs,
+    where the outcome is the API's response or the exception raised.
+
+    :Example:
+    >>> with nfsn.dns('example.com').batch() as batch:
+    ...     batch.remove('www', 'A', '192.0.2.1')
+    ...     batch.add('www', 'A', '192.0.2.2', ttl=300)
+    """
+
+    def __init__(self, dns, max_workers=parallel.MAX_WORKERS):
+        self.dns = dns
+        self.max_workers = max_workers
+        self._removals = OrderedDict()
+        self._additions = OrderedDict()
+        # Records that remove() dropped a queued add() of: the record might
+        # not exist.
+        self._cancelled = set()
+        self.results = []
+
+    def add(self, name, type, data, ttl=None):
+        """ Queue adding a record. Adding it again replaces its TTL. """
+        key = (name, type, data)
+        self._additions.pop(key, None)
+        self._additions[key] = Operation('addRR', name, type, data, ttl)
+
+    def remove(self, name, type, data):
+        """ Queue removing a record; this replaces a queued add() of it. """
+        key = (name, type, data)
+        if self._additions.pop(key, None) is not None:
+            self._cancelled.add(key)
+        self._removals[key] = Operation('removeRR', name, type, data, None)
+
+    @property
+    def operations(self):
+        """ The queued changes, in the order they will be made. """
+        return list(self._removals.values()) + list(self._additions.values())
+
+    def submit(self):
+        """ Make the queued changes, update the serial, and return the
+        results. Raises the first error, after updating the serial. """
+        self._drop_unneeded()
+        removals = list(self._removals.values())
+        additions = list(self._additions.values())
+        self._removals.clear()
+        self._additions.clear()
+        self._cancelled.clear()
+        if not (removals or additions):
+            return []
+
+        dns = self.dns
+        # The removals go first, so that a record whose TTL changed is
+        # removed before it is re-added.
+        outcomes = parallel.gather(
+            [partial(dns.removeRR, op.name, op.type, op.data)
+             for op in removals], self.max_workers)
+        outcomes.extend(parallel.gather(
+            [partial(dns.addRR, op.name, op.type, op.data, op.ttl)
+             for op in additions], self.max_workers))
+        self.results = list(zip(removals + additions, outcomes))
+
+        # Some changes might have gone through even if others failed, so
+        # always bump the serial.
+        dns.updateSerial()
+        error = parallel.first_error(outcomes)
+        if error is not None:
+            raise error
+        return self.results
+
+    def _drop_unneeded(self):
+        """ Drop the queued removals of records that do not exist, and
+        the removals and additions of records that already exist with the
+        same TTL, if they are records that add() and remove() were both
+        called for. """
+        unsure = [key for key in self._removals
+                  if key in self._cancelled or key in self._additions]
+        if not unsure:
+            return
+        # Bypass any cache: the zone might have changed since it was read.
+        current = dict((_rr_id(rr), _rr_ttl(rr))
+                       for rr in self.dns._send(_POST, 'listRRs'))
+        for key in unsure:
+            if key not in current:
+                del self._removals[key]
+                continue
+            op = self._additions.get(key)
+            if op is not None and (op.ttl is None or
+                                   str(op.ttl) == current[key]):
+                del self._removals[key]
+                del self._additions[key]
+
+    def __len__(self):
+        return len(self._removals) + len(self._additions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.submit()
+        return False
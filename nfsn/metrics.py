@@ -0,0 +1,220 @@
+""" Counters and latency histograms for API requests. """
+import threading
+import time
+
+try:
+    _now = time.monotonic
+except AttributeError:
+    # Python 2
+    _now = time.time
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+           float('inf'))
+
+# The quantiles that as_dict() reports.
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class EndpointStats(object):
+    """ The counters for one (object_name, action) pair, eg. ('dns',
+    'listRRs'). """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # HTTP status code -> number of responses
+        self.statuses = {}
+
+    def observe(self, seconds):
+        self.seconds += seconds
+        for (i, bound) in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """ Estimate the "q" quantile (eg. 0.95) of the latency, in seconds,
+        by interpolating within its histogram bucket (like Prometheus'
+        histogram_quantile()). Returns None if there are no requests. """
+        total = sum(self.counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        lower = 0.0
+        for (bound, count) in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                if bound == float('inf'):
+                    # We cannot interpolate in the last bucket.
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            if bound != float('inf'):
+                lower = bound
+        return lower
+
+    def as_dict(self):
+        stats = {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'seconds': self.seconds,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'statuses': dict((str(code), count)
+                             for (code, count) in self.statuses.items()),
+        }
+        for q in QUANTILES:
+            stats['p%d' % round(q * 100)] = self.quantile(q)
+        return stats
+
+
+class Metrics(object):
+    """ Count the API requests an Nfsn object makes, and how long they take,
+    for each object type and action. Safe to share between threads.
+
+    "before" hooks are called as hook(method, object_name, action) before
+    each HTTP request. "after" hooks are called as hook(method, object_name,
+    action, status_code, seconds, exception) after it; status_code is None
+    and "exception" is set if the request failed without a response. A
+    retried call makes several HTTP requests.
+
+    :Example:
+    >>> metrics = Metrics()
+    >>> nfsn = Nfsn(metrics=metrics)
+    >>> nfsn.dns('example.com').listRRs()
+    >>> metrics.as_dict()['dns']['listRRs']['p95']
+    >>> print(metrics.prometheus())
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        if self.buckets[-1] != float('inf'):
+            self.buckets += (float('inf'),)
+        self.before = []
+        self.after = []
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, before=None, after=None):
+        """ Register a function to call before and/or after each request.
+        """
+        if before is not None:
+            self.before.append(before)
+        if after is not None:
+            self.after.append(after)
+
+    def _stats(self, object_name, action):
+        key = (object_name, action)
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = EndpointStats(self.buckets)
+        return stats
+
+    def request_started(self, method, object_name, action):
+        """ Call the "before" hooks, and return the start time to pass to
+        request_finished(). """
+        for hook in self.before:
+            hook(method, object_name, action)
+        return _now()
+
+    def request_finished(self, started, method, object_name, action,
+                         status_code=None, bytes_in=0, bytes_out=0,
+                         exception=None):
+        """ Record one HTTP request, and call the "after" hooks. """
+        seconds = _now() - started
+        with self._lock:
+            stats = self._stats(object_name, action)
+            stats.requests += 1
+            stats.observe(seconds)
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            if status_code is None or not 200 <= status_code < 300:
+                stats.errors += 1
+            if status_code is not None:
+                stats.statuses[status_code] = \
+                    stats.statuses.get(status_code, 0) + 1
+        for hook in self.after:
+            hook(method, object_name, action, status_code, seconds,
+                 exception)
+
+    def retried(self, object_name, action, retries=1):
+        """ Record that a call was retried. """
+        with self._lock:
+            self._stats(object_name, action).retries += retries
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def as_dict(self):
+        """ Return the statistics as nested dicts, keyed by object type and
+        then by action, eg. {'dns': {'listRRs': {'requests': 2, 'p50':
+        0.08, ...}}}. Latencies are in seconds. """
+        with self._lock:
+            result = {}
+            for ((object_name, action), stats) in self._endpoints.items():
+                result.setdefault(object_name, {})[action] = stats.as_dict()
+            return result
+
+    def prometheus(self, prefix='nfsn'):
+        """ Return the statistics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+
+            metric('requests_total', 'counter', 'API requests.')
+            for (key, stats) in endpoints:
+                for (status_code, count) in sorted(stats.statuses.items()):
+                    lines.append('%s_requests_total{%s,status="%d"} %d' %
+                                 (prefix, _labels(key), status_code, count))
+                failed = stats.requests - sum(stats.statuses.values())
+                if failed:
+                    lines.append('%s_requests_total{%s,status="none"} %d' %
+                                 (prefix, _labels(key), failed))
+
+            for (name, attr, help_text) in (
+                    ('retries_total', 'retries', 'Retried API calls.'),
+                    ('response_bytes_total', 'bytes_in',
+                     'Bytes received in response bodies.'),
+                    ('request_bytes_total', 'bytes_out',
+                     'Bytes sent in request bodies.')):
+                metric(name, 'counter', help_text)
+                for (key, stats) in endpoints:
+                    lines.append('%s_%s{%s} %d' % (prefix, name, _labels(key),
+                                                   getattr(stats, attr)))
+
+            metric('request_duration_seconds', 'histogram',
+                   'API request latency.')
+            for (key, stats) in endpoints:
+                labels = _labels(key)
+                cumulative = 0
+                for (bound, count) in zip(stats.buckets, stats.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(
+                        '%s_request_duration_seconds_bucket{%s,le="%s"} %d' %
+                        (prefix, labels, le, cumulative))
+                lines.append('%s_request_duration_seconds_sum{%s} %r' %
+                             (prefix, labels, stats.seconds))
+                lines.append('%s_request_duration_seconds_count{%s} %d' %
+                             (prefix, labels, cumulative))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(key):
+    (object_name, action) = key
+    return 'object="%s",action="%s"' % (object_name, action)
@@ -0,0 +1,353 @@
+""" A local stand-in for the NearlyFreeSpeech.net API, for tests and load
+testing.
+
+The server answers from the fixture files in nfsn/tests/fixtures/responses
+(eg. "dns/example.com/listRRs"), checks each request's X-NFSN-Authentication
+header, and keeps the DNS records, email forwards and properties in memory,
+so addRR(), setForward() etc. change what later calls return. It can also
+add latency and inject errors.
+
+    >>> with MockNfsnServer(latency=0.05) as server:
+    ...     nfsn = Nfsn(login=server.login, api_key=server.api_key,
+    ...                 endpoint=server.url)
+    ...     nfsn.dns('example.com').addRR('www', 'A', '192.0.2.2')
+
+Or run it from the command line:
+
+    $ python -m nfsn.mockserver --port 8000 --latency 0.05
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl
+except ImportError:
+    # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qsl
+
+log = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'tests', 'fixtures', 'responses')
+
+# NFSN rejects requests whose timestamp is further off than this (seconds).
+MAX_CLOCK_SKEW = 300
+
+
+class MockError(Exception):
+    """ An API error response. """
+
+    def __init__(self, status, message):
+        super(MockError, self).__init__(message)
+        self.status = status
+
+
+class MockNfsnServer(object):
+    """ Serve the NFSN API on a local port, in a background thread.
+
+    "latency" is the number of seconds to wait before each response, plus a
+    random extra delay of up to "jitter" seconds. "error_rate" is the
+    fraction of requests (0 to 1) that fail with HTTP "error_status". Use
+    inject_errors() to fail the next few requests instead. """
+
+    def __init__(self, login='guest', api_key='1234567890123456',
+                 fixtures_dir=FIXTURES_DIR, host='127.0.0.1', port=0,
+                 latency=0, jitter=0, error_rate=0, error_status=503,
+                 check_auth=True):
+        self.login = login
+        self.api_key = api_key
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.check_auth = check_auth
+        # Number of requests served, including errors.
+        self.requests = 0
+        self._errors = []
+        self._zones = {}
+        self._serials = {}
+        self._forwards = {}
+        self._properties = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = _ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.mock = self
+
+    @property
+    def url(self):
+        (host, port) = self.httpd.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        # A short poll interval makes stop() quick.
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # State
+
+    def add_zone(self, domain, records=(), serial=1):
+        """ Create (or replace) a DNS zone, with a list of record dicts. """
+        with self._lock:
+            self._zones[domain] = [_rr(record) for record in records]
+            self._serials[domain] = serial
+
+    def records(self, domain):
+        """ Return a copy of a zone's records. """
+        with self._lock:
+            return [dict(rr) for rr in self._zone(domain)]
+
+    def add_email(self, domain, forwards=None):
+        """ Create (or replace) an email domain, with a dict of forwards. """
+        with self._lock:
+            self._forwards[domain] = dict(forwards or {})
+
+    def forwards(self, domain):
+        """ Return a copy of an email domain's forwards. """
+        with self._lock:
+            return dict(self._email(domain))
+
+    def inject_errors(self, *statuses):
+        """ Fail the next requests with these HTTP status codes, in order.
+        """
+        with self._lock:
+            self._errors.extend(statuses)
+
+    def _fixture(self, path):
+        """ Return the contents of a fixture file, or raise MockError. """
+        filename = os.path.join(self.fixtures_dir, *path.split('/'))
+        if '..' in path.split('/') or not os.path.isfile(filename):
+            raise MockError(404, 'Not found')
+        with open(filename) as fixture:
+            return fixture.read()
+
+    def _zone(self, domain):
+        if domain not in self._zones:
+            self._zones[domain] = json.loads(
+                self._fixture('dns/%s/listRRs' % domain))
+        return self._zones[domain]
+
+    def _serial(self, domain):
+        if domain not in self._serials:
+            self._zone(domain)
+            self._serials[domain] = int(
+                self._fixture('dns/%s/serial' % domain))
+        return self._serials[domain]
+
+    def _email(self, domain):
+        if domain not in self._forwards:
+            self._forwards[domain] = json.loads(
+                self._fixture('email/%s/listForwards' % domain))
+        return self._forwards[domain]
+
+    # Requests
+
+    def authenticate(self, path, header, body):
+        """ Check an X-NFSN-Authentication header, or raise MockError. """
+        try:
+            (login, timestamp, salt, signature) = header.split(';')
+            skew = abs(time.time() - int(timestamp))
+        except (AttributeError, ValueError):
+            raise MockError(401, 'Authentication failed: bad header')
+        if login != self.login or len(salt) != 16 or skew > MAX_CLOCK_SKEW:
+            raise MockError(401, 'Authentication failed')
+        body_hash = hashlib.sha1(body).hexdigest()
+        string = ';'.join((login, timestamp, salt, self.api_key, path,
+                           body_hash))
+        if hashlib.sha1(string.encode('utf-8')).hexdigest() != signature:
+            raise MockError(401, 'Authentication failed: bad signature')
+
+    def _injected_error(self):
+        with self._lock:
+            self.requests += 1
+            if self._errors:
+                return self._errors.pop(0)
+        if self.error_rate and random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    def handle(self, method, path, headers, body):
+        """ Return a (status, body) tuple for a request. """
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        status = self._injected_error()
+        if status is not None:
+            return (status, {'error': 'Injected error'})
+        try:
+            if self.check_auth:
+                self.authenticate(path, headers.get('X-NFSN-Authentication'),
+                                  body)
+            parts = path.strip('/').split('/')
+            if len(parts) != 3:
+                raise MockError(404, 'Not found')
+            (object_name, object_id, action) = parts
+            if method == 'PUT':
+                with self._lock:
+                    self._properties[path] = body.decode('utf-8')
+                return (200, '')
+            params = dict(parse_qsl(body.decode('utf-8'),
+                                     keep_blank_values=True))
+            handler = getattr(self, '_%s_%s' % (object_name, action), None)
+            with self._lock:
+                if handler is not None and method == 'POST':
+                    return (200, handler(object_id, params))
+                if object_name == 'dns' and action == 'serial':
+                    return (200, self._serial(object_id))
+                if path in self._properties:
+                    return (200, self._properties[path])
+                return (200, self._fixture(path))
+        except MockError as e:
+            return (e.status, {'error': str(e)})
+
+    def _dns_listRRs(self, domain, params):
+        return [rr for rr in self._zone(domain)
+                if all(rr[key] == params[key]
+                       for key in ('name', 'type', 'data') if key in params)]
+
+    def _dns_addRR(self, domain, params):
+        zone = self._zone(domain)
+        rr = _rr(params)
+        for existing in zone:
+            if _rr_id(existing) == _rr_id(rr):
+                raise MockError(400, 'Record already exists')
+        zone.append(rr)
+        return ''
+
+    def _dns_removeRR(self, domain, params):
+        zone = self._zone(domain)
+        for existing in zone:
+            if _rr_id(existing) == _rr_id(params):
+                zone.remove(existing)
+                return ''
+        raise MockError(404, 'No such record')
+
+    def _dns_updateSerial(self, domain, params):
+        self._serials[domain] = self._serial(domain) + 1
+        return ''
+
+    def _email_listForwards(self, domain, params):
+        return self._email(domain)
+
+    def _email_setForward(self, domain, params):
+        self._email(domain)[params['forward']] = params['dest_email']
+        return ''
+
+    def _email_removeForward(self, domain, params):
+        forwards = self._email(domain)
+        if params.get('forward') not in forwards:
+            raise MockError(404, 'No such forward')
+        del forwards[params['forward']]
+        return ''
+
+
+def _rr(params):
+    """ Normalize a resource record dict like NFSN's listRRs. """
+    try:
+        (name, type, data) = _rr_id(params)
+    except KeyError as e:
+        raise MockError(400, 'Missing parameter: %s' % e)
+    return {'name': name, 'type': type, 'data': data,
+            'ttl': str(params.get('ttl') or 3600),
+            'scope': params.get('scope', 'member')}
+
+
+def _rr_id(rr):
+    return (rr['name'], rr['type'], rr['data'])
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # Accept many simultaneous connections (the default is 5).
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close their connections early.
+        log.debug('error handling a request from %s', client_address,
+                  exc_info=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep connections open, like the real API.
+    protocol_version = 'HTTP/1.1'
+    # We write the headers and the body separately; do not let Nagle's
+    # algorithm hold back the body.
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        path = self.path.split('?', 1)[0]
+        (status, result) = self.server.mock.handle(self.command, path,
+                                                   self.headers, body)
+        if isinstance(result, (dict, list, int)):
+            result = json.dumps(result)
+        content = result.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-nfsn-api')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = _respond
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+def main(argv=None):
+    from optparse import OptionParser
+    parser = OptionParser(description='Run a local stand-in for the '
+                          'NearlyFreeSpeech.net API.')
+    parser.add_option('--host', default='127.0.0.1')
+    parser.add_option('--port', type='int', default=8000)
+    parser.add_option('--login', default='guest')
+    parser.add_option('--api-key', default='1234567890123456')
+    parser.add_option('--latency', type='float', default=0,
+                      help='seconds to wait before each response')
+    parser.add_option('--jitter', type='float', default=0,
+                      help='up to this many more seconds, at random')
+    parser.add_option('--error-rate', type='float', default=0,
+                      help='fraction of requests that fail with HTTP 503')
+    (options, _) = parser.parse_args(argv)
+    server = MockNfsnServer(login=options.login, api_key=options.api_key,
+                            host=options.host, port=options.port,
+                            latency=options.latency, jitter=options.jitter,
+                            error_rate=options.error_rate)
+    print('Serving the NFSN API on %s (login %s, API key %s)' %
+          (server.url, server.login, server.api_key))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,87 @@
+from beanbag.attrdict import AttrDict
 from beanbag.v2 import BeanBag, Request, BeanBagException
+from functools import partial
 import json
 import logging
+try:
+    # Optional faster JSON parser
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    # Optional incremental JSON parser, for streaming large responses
+    import ijson
+except ImportError:
+    ijson = None
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    # Python 2
+    from urlparse import urlparse
 
 log = logging.getLogger(__name__)
 
+# Content-Types for NFSN's JSON responses
+JSON_CONTENT_TYPES = ('application/x-nfsn-api', 'application/json')
+
+
+def loads(content):
+    """ Parse a JSON response body (bytes). Use orjson if it is installed.
+    Raises ValueError if the body is not JSON. """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content.decode('utf-8'))
+
+
+def _object_name(url):
+    """ Return the object type (eg. "dns") for an API URL or path. """
+    path = urlparse(url or '').path.lstrip('/')
+    return path.split('/', 1)[0]
+
+
+def _endpoint(url):
+    """ Return the (object_name, action) pair (eg. ("dns", "listRRs")) for
+    an API URL or path. """
+    parts = urlparse(url or '').path.strip('/').split('/')
+    if len(parts) < 3:
+        return (parts[0], '')
+    return (parts[0], parts[2])
+
+
 class NfsnBeanBag(BeanBag):
     """Tweak functionality in the BeanBag class to work with NFSN."""
 
+    def __init__(self, base_url, ext='', session=None, use_attrdict=True,
+                 rate_limiter=None, metrics=None, auth=None, timeout=None):
+        super(~NfsnBeanBag, self).__init__(base_url, ext=ext,
+                                           session=session,
+                                           use_attrdict=use_attrdict)
+        # Optional nfsn.ratelimit.RateLimiter
+        self.rate_limiter = rate_limiter
+        # Optional nfsn.metrics.Metrics
+        self.metrics = metrics
+        # Authentication (eg. NfsnAuth) and timeout for each request. We do
+        # not set these on the session, which other clients may share.
+        self.auth = auth
+        self.timeout = timeout
+
+    def make_request(self, path, verb, request):
+        """ Sign the request, wait for the rate limiter, and record the
+        request in the metrics. """
+        if self.auth is not None:
+            request.auth = self.auth
+        if self.timeout is not None:
+            request.timeout = self.timeout
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(_object_name(path[0]))
+        if self.metrics is None:
+            return super(~NfsnBeanBag, self).make_request(path, verb,
+                                                          request)
+        send = partial(super(~NfsnBeanBag, self).make_request, path, verb,
+                       request)
+        return timed_request(self.metrics, verb, path[0], send,
+                             (+request).get('stream'))
+
     def encode(self, body):
         """ Beanbag encodes the body as JSON, but NFSN expects the body to be
         regular key-value pairs that are not JSON-encoded. """
@@ -18,35 +93,129 @@ class NfsnBeanBag(BeanBag):
         return super(~NfsnBeanBag, self).encode(req)
 
     def decode(self, response):
-        """ Handle 'Unauthorized' response """
-        if response.status_code == 401:
-            log.error(response.content)
-            raise RuntimeError('Could not authenticate with login/key.')
+        """ Parse the response body exactly once. NFSN sends JSON with the
+        "application/x-nfsn-api" Content-Type, which BeanBag would reject, so
+        we do not hand the response to BeanBag's decode() at all. """
+        return decode_response(response, self.rate_limiter, self.use_attrdict)
+
+    def stream(self, path, verb, body=None, pairs=False):
+        """ Make a request and yield the elements of the JSON array in the
+        response as they arrive, without reading the whole body into memory
+        first. With pairs=True, the response is a JSON object, and we yield
+        its (key, value) pairs.
+
+        This needs the "ijson" package. Without it, we read and parse the
+        whole body, and then yield the elements. """
+        req = self.encode(body)
+        req.stream = True
+        response = self.make_request(path, verb, req)
+        for item in iter_items(self, response, pairs):
+            yield item
 
+
+def decode_response(response, rate_limiter=None, use_attrdict=True):
+    """ Check a requests.Response for errors, and parse its body. """
+    if rate_limiter is not None:
+        rate_limiter.observe(_object_name(response.url),
+                             response.status_code, response.headers)
+
+    if response.status_code == 401:
+        log.error(response.content)
+        raise RuntimeError('Could not authenticate with login/key.')
+
+    if response.status_code < 200 or response.status_code >= 300:
+        log.error(response.headers)
+        log.error(response.content)
+        raise BeanBagException(response, 'Bad response code: %d' %
+                               response.status_code)
+
+    content = response.content
+    try:
+        obj = loads(content)
+    except ValueError:
         # NFSN sometimes returns simple strings rather than JSON.
+        return content.decode('utf-8')
+
+    check_content_type(response, content)
+    if use_attrdict:
+        if isinstance(obj, dict) or isinstance(obj, list):
+            obj = AttrDict(obj)
+    return obj
+
+
+def check_content_type(response, content):
+    """ Raise BeanBagException if a JSON response (from requests or
+    aiohttp) has a Content-Type that is not one of NFSN's. """
+    res_content = response.headers.get('content-type', None)
+    if res_content is not None:
+        res_content = res_content.split(';', 1)[0]
+        if res_content not in JSON_CONTENT_TYPES:
+            log.error(response.headers)
+            log.error(content)
+            raise BeanBagException(response, 'Bad content-type in '
+                                   'response (Content-Type: %s)' %
+                                   res_content)
+
+
+def timed_request(metrics, verb, url, send, stream=False):
+    """ Call send() to make a request for "url", and record it in the
+    Metrics. """
+    (object_name, action) = _endpoint(url)
+    started = metrics.request_started(verb, object_name, action)
+    try:
+        response = send()
+    except Exception as e:
+        metrics.request_finished(started, verb, object_name, action,
+                                 exception=e)
+        raise
+    if stream:
+        # Do not read a streamed body here.
+        bytes_in = int(response.headers.get('content-length') or 0)
+    else:
+        bytes_in = len(response.content)
+    metrics.request_finished(started, verb, object_name, action,
+                             response.status_code, bytes_in,
+                             len(response.request.body or ''))
+    return response
+
+
+def iter_items(base, response, pairs=False):
+    """ Yield the elements (or with pairs=True, the (key, value) pairs) of
+    the JSON in a streamed response, and then close it. "base" is the
+    NfsnBeanBag (or DirectTransport) that made the request. """
+    try:
+        if ijson is None or not 200 <= response.status_code < 300:
+            # decode() reads the whole body, and raises for errors.
+            obj = base.decode(response)
+            if isinstance(obj, AttrDict):
+                obj = +obj
+            if pairs and isinstance(obj, dict):
+                items = list(obj.items())
+            elif not pairs and isinstance(obj, list):
+                items = obj
+            else:
+                # An empty body, or a simple string rather than JSON
+                items = []
+            for item in items:
+                yield item
+            return
+        if base.rate_limiter is not None:
+            base.rate_limiter.observe(_object_name(response.url),
+                                      response.status_code, response.headers)
+        response.raw.decode_content = True
+        if pairs:
+            items = ijson.kvitems(response.raw, '', use_float=True)
+        else:
+            items = ijson.items(response.raw, 'item', use_float=True)
+        started = False
         try:
-            json.loads(response.content.decode('utf-8'))
-        except ValueError as e:
-            #log.debug("%s : %s" % (e, response.content))
-            # Assume NFSN responded with a simple string (not JSON).
-            return response.content.decode('utf-8')
-
-        # NFSN sends JSON in the HTTP body, but the Content-Type HTTP header
-        # "application/x-nfsn-api". Set this content-type to JSON so BeanBag
-        # will parse it.
-        res_content = response.headers.get('content-type', None)
-        if res_content is None:
-            # Not sure this can ever happen?
-            log.debug('found no Content-Type header')
-        elif res_content == 'application/x-nfsn-api':
-            log.debug("found 'application/x-nfsn-api' Content-Type")
-            log.debug("Changing Content-Type to 'application/json'")
-            response.headers['content-type'] = self.mime_json
-
-        # Provide logging for other errors
-        try:
-            return super(~NfsnBeanBag, self).decode(response)
-        except BeanBagException as e:
-            log.error(e.response.headers)
-            log.error(e.response.content)
-            raise e
+            for item in items:
+                started = True
+                yield item
+        except ijson.JSONError:
+            # An empty body, or a simple string rather than JSON, has no
+            # elements. Anything else is a truncated response.
+            if started:
+                raise
+    finally:
+        response.close()
@@ -0,0 +1,40 @@
+""" Run API calls concurrently on a bounded thread pool.
+
+The calls share the Nfsn object's requests.Session, so they reuse its pooled
+connections. On Python 2 this requires the "futures" backport package. """
+
+# Default maximum number of API calls in flight at once.
+MAX_WORKERS = 8
+
+
+def gather(calls, max_workers=MAX_WORKERS):
+    """ Run each zero-argument callable in "calls" on a thread pool.
+
+    Return a list of outcomes in the same order as "calls". Each outcome is
+    the callable's return value, or the exception it raised (we do not stop
+    the other calls when one of them fails). """
+    # concurrent.futures is slow to import, and most runs never need it.
+    from concurrent.futures import ThreadPoolExecutor
+    calls = list(calls)
+    if not calls:
+        return []
+    workers = min(max_workers, len(calls))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(call) for call in calls]
+    outcomes = []
+    for future in futures:
+        exc = future.exception()
+        if exc is not None:
+            outcomes.append(exc)
+        else:
+            outcomes.append(future.result())
+    return outcomes
+
+
+def first_error(outcomes):
+    """ Return the first exception in a list of gather() outcomes, or
+    None. """
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            return outcome
+    return None
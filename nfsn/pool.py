@@ -0,0 +1,47 @@
+""" Pooled HTTP connections that several Nfsn objects can share. """
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ConnectionPool(object):
+    """ A requests.Session with a sized connection pool and default
+    timeouts.
+
+    NfsnAuth signs each request separately, so Nfsn objects with different
+    credentials can share one ConnectionPool, and keep its connections (and
+    TLS sessions) warm between calls.
+
+    "maxsize" is the number of connections to keep open to each host; give
+    at least as many as the number of threads that make calls at once.
+    "block=True" makes extra threads wait for a free connection, instead of
+    opening (and then discarding) a new one. "connections" is the number of
+    hosts to keep pools for. "timeout" is the default number of seconds to
+    wait for the server, or a (connect, read) tuple.
+
+    :Example:
+    >>> pool = ConnectionPool(maxsize=32, timeout=(3.05, 30))
+    >>> alice = Nfsn(login='alice', api_key='...', pool=pool)
+    >>> bob = Nfsn(login='bob', api_key='...', pool=pool)
+    """
+
+    def __init__(self, maxsize=10, block=False, connections=10,
+                 timeout=None):
+        self.maxsize = maxsize
+        self.block = block
+        self.connections = connections
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=connections,
+                              pool_maxsize=maxsize, pool_block=block)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self):
+        """ Close all the pooled connections. """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
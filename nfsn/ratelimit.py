@@ -0,0 +1,121 @@
+""" Client-side rate limiting for API requests. """
+import threading
+import time
+
+try:
+    _now = time.monotonic
+except AttributeError:
+    # Python 2
+    _now = time.time
+
+
+class TokenBucket(object):
+    """ Allow "rate" requests per second on average, with bursts of up to
+    "burst" requests. Safe to share between threads. """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self.tokens = self.burst
+        self.updated = _now()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """ Take one token, and return the number of seconds the caller
+        must wait before using it. """
+        with self.lock:
+            now = _now()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Let the balance go negative, so that waiting callers queue up
+            # in order instead of racing for each new token.
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimiter(object):
+    """ Limit the request rate for an Nfsn object, overall ("rate"), and for
+    each object type ("rates", eg. {'dns': 2}). Rates are requests per
+    second; None means unlimited.
+
+    When NFSN answers with HTTP 429 or a 5xx error, halve the current rates
+    (down to "min_rate") and honor any Retry-After header. Each successful
+    response raises the rates again by a tenth of the configured rate, up
+    to the configured rate.
+
+    :Example:
+    >>> nfsn = Nfsn(rate_limiter=RateLimiter(rate=10, rates={'dns': 4}))
+    """
+
+    def __init__(self, rate=None, burst=None, rates=None, min_rate=0.1):
+        self.min_rate = min_rate
+        self._configured = {}
+        self._buckets = {}
+        if rate is not None:
+            self._configured[None] = rate
+            self._buckets[None] = TokenBucket(rate, burst)
+        for (object_name, object_rate) in (rates or {}).items():
+            if object_rate is None:
+                continue
+            self._configured[object_name] = object_rate
+            self._buckets[object_name] = TokenBucket(object_rate)
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, object_name=None):
+        """ Block until we may send a request for this object type. """
+        pause = self._paused_until - _now()
+        if pause > 0:
+            time.sleep(pause)
+        for key in (None, object_name):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.acquire()
+
+    def observe(self, object_name, status_code, headers=None):
+        """ Adapt the rates to a response's HTTP status code. """
+        if status_code == 429 or status_code >= 500:
+            retry_after = None
+            if headers is not None:
+                retry_after = headers.get('retry-after')
+            self.throttle(object_name, retry_after)
+        elif 200 <= status_code < 300:
+            self.relax(object_name)
+
+    def throttle(self, object_name=None, retry_after=None):
+        with self._lock:
+            for key in (None, object_name):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.rate = max(self.min_rate, bucket.rate / 2)
+            try:
+                pause = float(retry_after)
+            except (TypeError, ValueError):
+                # Missing, or an HTTP date, which NFSN does not send.
+                return
+            self._paused_until = max(self._paused_until, _now() + pause)
+
+    def relax(self, object_name=None):
+        with self._lock:
+            for key in (None, object_name):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    configured = self._configured[key]
+                    bucket.rate = min(configured,
+                                      bucket.rate + configured / 10.0)
+
+    def rate(self, object_name=None):
+        """ Return the current rate (requests per second) overall, or for
+        one object type, or None if it is unlimited. """
+        bucket = self._buckets.get(object_name)
+        if bucket is None:
+            return None
+        return bucket.rate
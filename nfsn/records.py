@@ -0,0 +1,98 @@
+""" Compact, typed records for API list results.
+
+These are tuples, so they are small, hashable, and comparable. Pass
+as_records=True to NfsnDns.listRRs() or NfsnEmail.listForwards() to get them
+instead of AttrDicts. """
+from beanbag.attrdict import AttrDict
+from collections import namedtuple
+import csv
+import json
+import sys
+
+try:
+    intern = sys.intern
+except AttributeError:
+    # Python 2
+    intern = intern
+
+
+class ResourceRecord(namedtuple('ResourceRecord',
+                                'name type data ttl scope')):
+    """ A DNS resource record. "ttl" is an int, or None if unknown. """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, rr):
+        """ Build a ResourceRecord from a listRRs() dict. """
+        ttl = rr['ttl'] if 'ttl' in rr else None
+        if ttl is not None:
+            ttl = int(ttl)
+        scope = rr['scope'] if 'scope' in rr else 'member'
+        # There are only a few distinct types and scopes, so share the
+        # strings between records.
+        return cls(rr['name'], intern(str(rr['type'])), rr['data'], ttl,
+                   intern(str(scope)))
+
+    def to_dict(self):
+        """ Return a plain dict, like the ones listRRs() returns. """
+        rr = {'name': self.name, 'type': self.type, 'data': self.data,
+              'scope': self.scope}
+        if self.ttl is not None:
+            rr['ttl'] = str(self.ttl)
+        return rr
+
+
+class EmailForward(namedtuple('EmailForward', 'forward dest_email')):
+    """ An email forward, eg. EmailForward('hello', 'h@example.net'). """
+
+    __slots__ = ()
+
+
+def resource_records(rrs):
+    """ Convert a listRRs() result to a list of ResourceRecords. """
+    if isinstance(rrs, AttrDict):
+        # Read the plain list underneath.
+        rrs = +rrs
+    return [ResourceRecord.from_dict(rr) for rr in rrs]
+
+
+def email_forwards(forwards):
+    """ Convert a listForwards() result to a list of EmailForwards. """
+    if isinstance(forwards, AttrDict):
+        forwards = +forwards
+    return [EmailForward(forward, dest_email)
+            for (forward, dest_email) in forwards.items()]
+
+
+def load_forwards(filename):
+    """ Read email forwards from a JSON or CSV file, for
+    NfsnEmail.sync_forwards(), and return a list of EmailForwards.
+
+    A ".json" file holds an object of forward -> dest_email, or a list of
+    [forward, dest_email] pairs or {"forward": ..., "dest_email": ...}
+    objects. Any other file is CSV, with a forward and a dest_email on each
+    row, and an optional "forward,dest_email" header row. """
+    if filename.lower().endswith('.json'):
+        with open(filename) as json_file:
+            data = json.load(json_file)
+        if isinstance(data, dict):
+            data = sorted(data.items())
+        return [EmailForward(forward['forward'], forward['dest_email'])
+                if isinstance(forward, dict) else EmailForward(*forward)
+                for forward in data]
+
+    if sys.version_info[0] < 3:
+        csv_file = open(filename, 'rb')
+    else:
+        csv_file = open(filename, newline='')
+    with csv_file:
+        rows = [[field.strip() for field in row]
+                for row in csv.reader(csv_file) if row]
+    if rows and rows[0] == ['forward', 'dest_email']:
+        rows = rows[1:]
+    for row in rows:
+        if len(row) != 2:
+            raise ValueError('%s: expected "forward,dest_email", got %r' %
+                             (filename, ','.join(row)))
+    return [EmailForward(*row) for row in rows]
@@ -0,0 +1,85 @@
+""" Retry failed API calls with exponential backoff. """
+from beanbag.v2 import BeanBagException
+import logging
+import random
+import requests
+import time
+
+log = logging.getLogger(__name__)
+
+
+def _status_code(exc):
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+class RetryPolicy(object):
+    """ Retry API calls that fail with a connection error, a timeout, HTTP
+    429, or a 5xx error.
+
+    Reads (GETs, PUTs of a property, and list* calls) are simply repeated.
+    Changes like addRR() are only repeated after checking the current state
+    shows that the change did not already happen. Other changes are only
+    repeated if we could not connect at all.
+
+    Each attempt is a new HTTP request, so NfsnAuth signs it again with a
+    fresh timestamp and salt.
+
+    :Example:
+    >>> nfsn = Nfsn(retry=RetryPolicy(attempts=5, backoff=1))
+    """
+
+    def __init__(self, attempts=3, backoff=0.5, max_backoff=30):
+        # Total number of attempts, including the first one.
+        self.attempts = attempts
+        # Seconds to wait before the first retry. This doubles for each
+        # retry after that, up to max_backoff.
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt):
+        """ Return a random delay before retry number "attempt" ("full
+        jitter"), so that many clients do not retry in lockstep. """
+        limit = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, limit)
+
+    def retryable(self, exc, idempotent):
+        """ Should we try again after this exception? """
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            # The server never got the request.
+            return True
+        if not idempotent:
+            return False
+        if isinstance(exc, (requests.exceptions.ConnectionError,
+                            requests.exceptions.Timeout)):
+            return True
+        if isinstance(exc, BeanBagException):
+            status_code = _status_code(exc)
+            return status_code == 429 or (status_code or 0) >= 500
+        return False
+
+    def call(self, function, idempotent=True, check=None):
+        """ Call "function" until it succeeds or we run out of attempts.
+
+        For a non-idempotent call, "check" is an optional function that
+        returns True if the change already happened. With a "check", we
+        retry the call like an idempotent one, but first ask "check", and
+        return '' (NFSN's usual response to a change) if it returns True. A
+        retryable failure of "check" counts as a failed attempt. """
+        if check is not None:
+            idempotent = True
+        attempt = 1
+        while True:
+            try:
+                if attempt > 1 and check is not None and check():
+                    return ''
+                return function()
+            except Exception as e:
+                if attempt >= self.attempts or \
+                        not self.retryable(e, idempotent):
+                    raise
+                delay = self.delay(attempt)
+                log.warning('attempt %d failed (%s), retrying in %.1fs',
+                            attempt, e, delay)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,70 @@
+""" Share one API call between threads that make the same read at once. """
+import threading
+
+
+class _Call(object):
+    """ A call in flight, and its outcome. """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """ Coalesce identical in-flight reads.
+
+    When a thread asks for a key that another thread is already fetching,
+    it waits for that call and gets the same result (or exception), instead
+    of making its own HTTP request. Once the call finishes, the next request
+    for the key makes a new call; nothing is cached.
+
+    The waiting threads all get the same result object, so do not change
+    it in place.
+
+    :Example:
+    >>> nfsn = Nfsn(coalesce=True)
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        # The number of calls that shared another call's result.
+        self.shared = 0
+
+    def do(self, key, function):
+        """ Return function(), or the result of the call already in flight
+        for "key". """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def forget(self, object_name, object_id):
+        """ Make later reads of this object start a new call, eg. after a
+        change. Threads already waiting still get the old call's result. """
+        with self._lock:
+            for key in list(self._calls):
+                if key[:2] == (object_name, object_id):
+                    del self._calls[key]
@@ -0,0 +1,351 @@
+""" An inventory of everything a member has, fetched concurrently. """
+from . import parallel
+from .records import ResourceRecord
+from beanbag.attrdict import AttrDict
+from collections import namedtuple
+import gzip
+import json
+import time
+
+# The account properties that a snapshot records.
+ACCOUNT_PROPERTIES = ('balance', 'friendlyName', 'status', 'sites')
+
+# Bump this when the file format changes.
+FORMAT_VERSION = 1
+
+
+def _plain(value):
+    """ Turn an AttrDict into plain dicts and lists. """
+    if isinstance(value, AttrDict):
+        return +value
+    return value
+
+
+def _unique(items):
+    """ Return a list of the items, without duplicates, in order. """
+    seen = set()
+    return [item for item in items if not (item in seen or seen.add(item))]
+
+
+class Change(namedtuple('Change',
+                        'object_name object_id change key old new')):
+    """ One difference between two snapshots.
+
+    "object_name" is "account", "dns", "email" or "member"; "object_id" is
+    the account number, domain or login. "change" is "added", "removed" or
+    "modified". "key" is what changed: a property name (eg. "balance"), a
+    (name, type, data) record key, a forward, or a site name; or None if a
+    whole account, zone or email domain was added or removed. "old" and
+    "new" are the values before and after, or None. """
+    __slots__ = ()
+
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+
+
+class Snapshot(object):
+    """ A member's accounts, sites, DNS zones and email forwards.
+
+    "accounts" maps each account number to a dict of its properties (see
+    ACCOUNT_PROPERTIES). "sites" is a sorted list of site names. "dns" maps
+    each domain to a dict with its "serial" and its "records" (a sorted list
+    of ResourceRecords). "email" maps each domain to a dict of forwards.
+    "errors" maps the calls that failed (eg. "dns/example.com/listRRs") to
+    their error messages. "taken" is when the snapshot started, in seconds
+    since the epoch. "domains" and "email_domains" are the domains that we
+    asked for.
+
+    :Example:
+    >>> snapshot = nfsn.snapshot('myusername', domains=['example.com'])
+    >>> snapshot.save('inventory.json.gz')
+    >>> snapshot = Snapshot.load('inventory.json.gz')
+    """
+
+    def __init__(self, login, taken=None, accounts=None, sites=None,
+                 dns=None, email=None, errors=None, domains=None,
+                 email_domains=None):
+        self.login = login
+        self.taken = time.time() if taken is None else taken
+        self.accounts = accounts or {}
+        self.sites = sites or []
+        self.dns = dns or {}
+        self.email = email or {}
+        self.errors = errors or {}
+        self.domains = sorted(self.dns) if domains is None else domains
+        if email_domains is None:
+            email_domains = sorted(self.email)
+        self.email_domains = email_domains
+
+    def to_dict(self):
+        """ Return the snapshot as JSON-serializable dicts and lists. """
+        dns = dict((domain, {'serial': zone['serial'],
+                             'records': [list(rr) for rr in zone['records']]})
+                   for (domain, zone) in self.dns.items())
+        return {'version': FORMAT_VERSION, 'login': self.login,
+                'taken': self.taken, 'accounts': self.accounts,
+                'sites': self.sites, 'dns': dns, 'email': self.email,
+                'errors': self.errors, 'domains': self.domains,
+                'email_domains': self.email_domains}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError('unknown snapshot version: %r' %
+                             data.get('version'))
+        dns = dict((domain, {'serial': zone['serial'],
+                             'records': [ResourceRecord(*rr)
+                                         for rr in zone['records']]})
+                   for (domain, zone) in data['dns'].items())
+        return cls(data['login'], taken=data['taken'],
+                   accounts=data['accounts'], sites=data['sites'], dns=dns,
+                   email=data['email'], errors=data['errors'],
+                   domains=data.get('domains'),
+                   email_domains=data.get('email_domains'))
+
+    def save(self, filename):
+        """ Write the snapshot to a gzipped JSON file. """
+        content = json.dumps(self.to_dict(), sort_keys=True,
+                             separators=(',', ':'))
+        with gzip.open(filename, 'wb') as snapshot_file:
+            snapshot_file.write(content.encode('utf-8'))
+
+    @classmethod
+    def load(cls, filename):
+        """ Read a snapshot that save() wrote. """
+        with gzip.open(filename, 'rb') as snapshot_file:
+            content = snapshot_file.read()
+        return cls.from_dict(json.loads(content.decode('utf-8')))
+
+    def refresh(self, nfsn, max_workers=parallel.MAX_WORKERS):
+        """ Fetch a new snapshot of the same member and domains, only
+        re-fetching the records of zones whose serial changed. Returns a
+        (snapshot, changes) tuple; see changes(). """
+        new = crawl(nfsn, self.login, self.domains, self.email_domains,
+                    max_workers, previous=self)
+        return (new, changes(self, new))
+
+    def __eq__(self, other):
+        if not isinstance(other, Snapshot):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<Snapshot(%s: %d accounts, %d sites, %d zones, %d email ' \
+            'domains)>' % (self.login, len(self.accounts), len(self.sites),
+                           len(self.dns), len(self.email))
+
+
+def _fetch(nfsn, snapshot, calls, max_workers):
+    """ Run (object_name, object_id, action) calls concurrently. Return a
+    dict of the results, and record any errors in the snapshot. """
+    calls = _unique(calls)
+    results = nfsn.batch([(call, _getter(nfsn, *call)) for call in calls],
+                         max_workers)
+    values = {}
+    for (call, result) in results.items():
+        if isinstance(result, Exception):
+            snapshot.errors['/'.join(call)] = str(result)
+        else:
+            values[call] = result
+    return values
+
+
+def _getter(nfsn, object_name, object_id, action):
+    """ Return a function that reads one property or list. """
+    handle = getattr(nfsn, object_name)(object_id)
+    if action == 'listRRs':
+        return lambda: handle.listRRs(as_records=True)
+    if action == 'listForwards':
+        return lambda: _plain(handle.listForwards())
+    return lambda: _plain(getattr(handle, action))
+
+
+def crawl(nfsn, login, domains=(), email_domains=None,
+          max_workers=parallel.MAX_WORKERS, previous=None):
+    """ Fetch a Snapshot for the member "login". See Nfsn.snapshot().
+
+    With a "previous" Snapshot, reuse its records for each zone whose serial
+    has not changed, instead of fetching them again. Where a call fails, we
+    also carry the previous value forward, rather than leaving it out. """
+    domains = _unique(domains)
+    if email_domains is None:
+        email_domains = domains
+    email_domains = _unique(email_domains)
+    snapshot = Snapshot(login, domains=domains, email_domains=email_domains)
+    unchanged = {}
+
+    # First, everything we can ask for straight away. We read each zone's
+    # serial before its records, so that if the zone changes meanwhile, the
+    # serial we store is older than the records, never newer.
+    calls = [('member', login, 'accounts'), ('member', login, 'sites')]
+    calls += [('dns', domain, 'serial') for domain in domains]
+    calls += [('email', domain, 'listForwards') for domain in email_domains]
+    first = _fetch(nfsn, snapshot, calls, max_workers)
+
+    # The serial changes with every change to a zone.
+    for domain in domains:
+        serial = first.get(('dns', domain, 'serial'))
+        if previous is not None and domain in previous.dns and \
+                serial is not None and \
+                previous.dns[domain]['serial'] == serial:
+            unchanged[domain] = previous.dns[domain]
+
+    accounts = first.get(('member', login, 'accounts'))
+    if accounts is None:
+        # We could not list the accounts, so look at the ones we knew of.
+        accounts = sorted(previous.accounts) if previous is not None else []
+    calls = [('account', number, action) for number in accounts
+             for action in ACCOUNT_PROPERTIES]
+    calls += [('dns', domain, 'listRRs') for domain in domains
+              if ('dns', domain, 'serial') in first and
+              domain not in unchanged]
+    second = _fetch(nfsn, snapshot, calls, max_workers)
+
+    sites = set(first.get(('member', login, 'sites'), []))
+    for number in accounts:
+        known = {} if previous is None else previous.accounts.get(number, {})
+        properties = {}
+        for action in ACCOUNT_PROPERTIES:
+            if ('account', number, action) in second:
+                properties[action] = second[('account', number, action)]
+            elif action in known:
+                properties[action] = known[action]
+        snapshot.accounts[number] = properties
+        sites.update(properties.get('sites', []))
+    if ('member', login, 'sites') not in first and previous is not None:
+        sites.update(previous.sites)
+    snapshot.sites = sorted(sites)
+
+    for domain in domains:
+        if domain in unchanged:
+            snapshot.dns[domain] = {'serial': unchanged[domain]['serial'],
+                                    'records': unchanged[domain]['records']}
+        elif ('dns', domain, 'listRRs') in second:
+            snapshot.dns[domain] = {
+                'serial': first[('dns', domain, 'serial')],
+                'records': sorted(second[('dns', domain, 'listRRs')],
+                                  key=_record_key)}
+        elif previous is not None and domain in previous.dns:
+            # Keep the previous serial too, so that the next refresh reads
+            # the records again.
+            snapshot.dns[domain] = previous.dns[domain]
+    for domain in email_domains:
+        if ('email', domain, 'listForwards') in first:
+            snapshot.email[domain] = first[('email', domain, 'listForwards')]
+        elif previous is not None and domain in previous.email:
+            snapshot.email[domain] = previous.email[domain]
+    return snapshot
+
+
+def _record_key(rr):
+    """ Sort records by name, type and data; a TTL may be None. """
+    return (rr.name, rr.type, rr.data, rr.ttl or 0, rr.scope or '')
+
+
+def changes(old, new):
+    """ Compare two snapshots of a member, and return a list of Changes.
+
+    A failed call in "new" (see Snapshot.errors) does not mean that
+    anything was removed, so we skip the objects that it was about. """
+    failed = _failed(new.errors)
+    feed = []
+    login = new.login
+    if not (failed.get('member') or failed.get('account')):
+        # Otherwise we do not know all the sites.
+        for site in sorted(set(old.sites) - set(new.sites)):
+            feed.append(Change('member', login, 'removed', site, site, None))
+    for site in sorted(set(new.sites) - set(old.sites)):
+        feed.append(Change('member', login, 'added', site, None, site))
+
+    skip = failed.get('account', set())
+    if login in failed.get('member', ()):
+        # We might not know all the accounts.
+        skip = skip | (set(old.accounts) - set(new.accounts))
+    feed.extend(_compare('account', old.accounts, new.accounts,
+                         _compare_dicts, skip))
+    feed.extend(_compare('dns', old.dns, new.dns, _compare_zones,
+                         failed.get('dns', ())))
+    feed.extend(_compare('email', old.email, new.email, _compare_dicts,
+                         failed.get('email', ())))
+    return feed
+
+
+def _failed(errors):
+    """ Return a dict of object_name -> the set of object_ids that have a
+    call in "errors" (keyed like "dns/example.com/listRRs"). """
+    failed = {}
+    for call in errors:
+        parts = call.split('/')
+        failed.setdefault(parts[0], set()).add('/'.join(parts[1:-1]))
+    return failed
+
+
+def _compare(object_name, old, new, compare, skip=()):
+    """ Compare two dicts of objects (eg. domain -> zone), using
+    compare(object_name, object_id, old, new) for objects in both. Leave
+    out the object_ids in "skip". """
+    feed = []
+    for object_id in sorted(set(old) | set(new)):
+        if object_id in skip:
+            continue
+        if object_id not in new:
+            feed.append(Change(object_name, object_id, 'removed', None,
+                               old[object_id], None))
+        elif object_id not in old:
+            feed.append(Change(object_name, object_id, 'added', None, None,
+                               new[object_id]))
+        else:
+            feed.extend(compare(object_name, object_id, old[object_id],
+                                new[object_id]))
+    return feed
+
+
+def _compare_dicts(object_name, object_id, old, new):
+    """ Compare account properties, or email forwards. """
+    feed = []
+    for key in sorted(set(old) | set(new)):
+        if key not in new:
+            feed.append(Change(object_name, object_id, 'removed', key,
+                               old[key], None))
+        elif key not in old:
+            feed.append(Change(object_name, object_id, 'added', key, None,
+                               new[key]))
+        elif old[key] != new[key]:
+            feed.append(Change(object_name, object_id, 'modified', key,
+                               old[key], new[key]))
+    return feed
+
+
+def _compare_zones(object_name, object_id, old, new):
+    """ Compare the records of two versions of a zone. A record whose TTL
+    (or scope) changed is "modified". """
+    if old['serial'] == new['serial'] and old['records'] == new['records']:
+        return []
+    old_records = dict((_record_id(rr), rr) for rr in old['records'])
+    new_records = dict((_record_id(rr), rr) for rr in new['records'])
+    feed = []
+    for key in sorted(set(old_records) | set(new_records)):
+        before = old_records.get(key)
+        after = new_records.get(key)
+        if after is None:
+            feed.append(Change(object_name, object_id, 'removed', key,
+                               before, None))
+        elif before is None:
+            feed.append(Change(object_name, object_id, 'added', key, None,
+                               after))
+        elif before != after:
+            feed.append(Change(object_name, object_id, 'modified', key,
+                               before, after))
+    return feed
+
+
+def _record_id(rr):
+    return (rr.name, rr.type, rr.data)
@@ -0,0 +1,38 @@
+import httpretty
+import pytest
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 5):
+    # async/await syntax
+    collect_ignore.append('test_aio.py')
+
+
+@pytest.fixture(scope='module')
+def real_sockets():
+    """ Disable httpretty for the tests in a module that talk to a real
+    local server (eg. MockNfsnServer). test_api leaves httpretty enabled,
+    and its fake sockets would hide the server. """
+    was_enabled = httpretty.is_enabled()
+    httpretty.disable()
+    yield
+    if was_enabled:
+        httpretty.enable()
+
+
+class RecordingRateLimiter(object):
+    """ Record the calls that a transport makes to its rate limiter. """
+
+    def __init__(self):
+        self.calls = []
+
+    def acquire(self, object_name=None):
+        self.calls.append(('acquire', object_name))
+
+    def observe(self, object_name, status_code, headers=None):
+        self.calls.append(('observe', object_name, status_code))
+
+
+@pytest.fixture
+def rate_limiter():
+    return RecordingRateLimiter()
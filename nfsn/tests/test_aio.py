@@ -0,0 +1,110 @@
+import asyncio
+import os
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from beanbag.v2 import BeanBagException
+from nfsn.aio import AsyncNfsn
+
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+fixtures_dir = os.path.join(tests_dir, 'fixtures')
+
+
+# httpretty's fake sockets do not work with asyncio, so we talk to a real
+# local server here instead.
+pytestmark = pytest.mark.usefixtures('real_sockets')
+
+
+async def fixture_handler(request):
+    """ Serve the flat files under fixtures/responses, like test_api. """
+    assert 'X-NFSN-Authentication' in request.headers
+    if request.method == 'PUT':
+        payload = await request.text()
+    else:
+        path = '/' + request.match_info['tail']
+        with open(fixtures_dir + '/responses' + path) as data_file:
+            payload = data_file.read()
+    return web.Response(text=payload, content_type='application/x-nfsn-api')
+
+
+async def html_handler(request):
+    return web.Response(text='"ok"', content_type='text/html')
+
+
+def run(coro_function, prefix='/', handler=fixture_handler):
+    """ Run coro_function(nfsn) against a local fixture server, with the
+    API under "prefix". """
+    async def wrapper():
+        app = web.Application()
+        app.router.add_route('*', prefix + '{tail:.*}', handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            endpoint = str(server.make_url(prefix))
+            async with AsyncNfsn(login='guest', api_key='1234567890123456',
+                                 endpoint=endpoint) as nfsn:
+                return await coro_function(nfsn)
+        finally:
+            await server.close()
+    return asyncio.new_event_loop().run_until_complete(wrapper())
+
+
+class TestAsyncNfsn(object):
+
+    def test_get_balance(self):
+        async def f(nfsn):
+            return await nfsn.account('A1B2-C3D4E5F6').balance
+        assert run(f) == 9.04
+
+    def test_get_friendly_name(self):
+        async def f(nfsn):
+            return await nfsn.account('A1B2-C3D4E5F6').friendlyName
+        assert run(f) == 'Personal'
+
+    def test_set_expire(self):
+        async def f(nfsn):
+            return await nfsn.dns('example.com').set('expire', 86401)
+        assert run(f) == 86401
+
+    def test_listrrs(self):
+        async def f(nfsn):
+            return await nfsn.dns('example.com').listRRs(name='foo')
+        result = run(f)
+        assert [rr['type'] for rr in result] == ['A', 'NS']
+
+    def test_add_rr(self):
+        async def f(nfsn):
+            return await nfsn.dns('example.com').addRR('testing', 'A',
+                                                       '192.0.2.2')
+        assert run(f) == ''
+
+    def test_list_forwards(self):
+        async def f(nfsn):
+            return await nfsn.email('example.com').listForwards()
+        assert run(f) == {'hello': 'customerservice@example.net'}
+
+    def test_concurrent_calls(self):
+        async def f(nfsn):
+            member = nfsn.member('guest')
+            return await asyncio.gather(member.accounts, member.sites)
+        assert run(f) == [['A1B2-C3D4E5F6'], ['coolsite', 'anothercoolsite']]
+
+    def test_endpoint_with_path(self):
+        signed = []
+        async def f(nfsn):
+            header = nfsn.auth.header
+            def sign(path, body):
+                signed.append(path)
+                return header(path, body)
+            nfsn.auth.header = sign
+            return await nfsn.dns('example.com').serial
+        assert run(f, prefix='/api/') == 1414129428
+        assert signed == ['/api/dns/example.com/serial']
+
+    def test_bad_content_type(self):
+        async def f(nfsn):
+            return await nfsn.dns('example.com').serial
+        with pytest.raises(BeanBagException):
+            run(f, handler=html_handler)
@@ -1,3 +1,4 @@
+import nfsn as nfsn_module
 from nfsn import Nfsn
 import httpretty
 import os
@@ -49,6 +50,20 @@ def put_request_callback(request, uri, headers):
     return (200, headers, request.body)
 
 
+def record_calls(monkeypatch, cls, *names):
+    """ Replace the methods "names" of an NfsnObject class with ones that
+    record their calls, and return the list of calls. """
+    calls = []
+    def recorder(name):
+        def record(obj, *args):
+            calls.append((name,) + args)
+            return ''
+        return record
+    for name in names:
+        monkeypatch.setattr(cls, name, recorder(name))
+    return calls
+
+
 class NfsnTest(object):
 
     nfsn = Nfsn(login='guest', api_key='1234567890123456')
@@ -91,6 +106,108 @@ class TestNfsnConstructor(NfsnTest):
         nfsn = Nfsn()
         assert type(nfsn) is Nfsn
 
+class TestNfsnCache(NfsnTest):
+
+    def setup(self):
+        self.nfsn = Nfsn(login='guest', api_key='1234567890123456',
+                         cache=True)
+        self.dns = self.nfsn.dns('example.com')
+
+    def test_cached_property(self):
+        serial = self.dns.serial
+        assert self.nfsn.cache.get(('dns', 'example.com', 'serial', ())) \
+            == serial
+        assert self.nfsn.dns('example.com').serial == serial
+
+    def test_cached_list(self):
+        result = self.dns.listRRs(name='foo')
+        assert self.dns.listRRs(name='foo') is result
+        assert self.dns.listRRs() is not result
+
+    def test_mutation_invalidates(self):
+        self.dns.serial
+        self.dns.listRRs()
+        self.nfsn.email('example.com').listForwards()
+        self.dns.addRR(name='testing', type='A', data='192.0.2.2')
+        assert len(self.nfsn.cache) == 1
+
+    def test_setattr_invalidates(self):
+        self.dns.expire
+        self.dns.expire = 86401
+        assert len(self.nfsn.cache) == 0
+
+
+class TestNfsnHandles(NfsnTest):
+
+    def setup(self):
+        self.nfsn = Nfsn(login='guest', api_key='1234567890123456')
+
+    def test_same_handle(self):
+        dns = self.nfsn.dns('example.com')
+        assert self.nfsn.dns('example.com') is dns
+        assert self.nfsn.email('example.com') is not dns
+
+    def test_object_id_is_interned(self):
+        domain = ''.join(['example', '.com'])
+        assert self.nfsn.dns(domain).object_id is \
+            nfsn_module.intern('example.com')
+
+    def test_recent_handles_are_bounded(self):
+        self.nfsn.max_handles = 2
+        for i in range(5):
+            self.nfsn.dns('example%d.com' % i)
+        assert len(self.nfsn._recent) == 2
+
+    def test_handles_in_use_are_kept(self):
+        self.nfsn.max_handles = 1
+        dns = self.nfsn.dns('example.com')
+        self.nfsn.dns('example.net')
+        assert self.nfsn.dns('example.com') is dns
+
+    def test_path(self):
+        dns = self.nfsn.dns('example.com')
+        assert (dns._base, dns._path('listRRs')) == ~dns.beanbag.listRRs
+
+
+class TestNfsnBatch(NfsnTest):
+
+    def test_map_property(self):
+        result = self.nfsn.map('account', ['A1B2-C3D4E5F6'], 'balance')
+        assert result == {'A1B2-C3D4E5F6': 9.04}
+
+    def test_map_method(self):
+        result = self.nfsn.map('email', ['example.com'], 'listForwards')
+        assert result['example.com'] == {
+            'hello': 'customerservice@example.net'}
+
+    def test_map_method_with_arguments(self):
+        result = self.nfsn.map('dns', ['example.com'], 'listRRs',
+                               name='foo', max_workers=2)
+        assert len(result['example.com']) == 2
+
+    def test_map_keeps_submission_order(self):
+        ids = ['A1B2-C3D4E5F6', 'no-such-account', 'A1B2-C3D4E5F6-2']
+        result = self.nfsn.map('account', ids, 'balance')
+        assert list(result.keys()) == ids
+
+    def test_map_gathers_exceptions(self):
+        ids = ['A1B2-C3D4E5F6', 'no-such-account']
+        result = self.nfsn.map('account', ids, 'balance')
+        assert result['A1B2-C3D4E5F6'] == 9.04
+        assert isinstance(result['no-such-account'], Exception)
+
+    def test_batch(self):
+        member = self.nfsn.member('guest')
+        result = self.nfsn.batch([
+            ('accounts', lambda: member.accounts),
+            ('sites', lambda: member.sites),
+        ])
+        assert list(result.items()) == [
+            ('accounts', ['A1B2-C3D4E5F6']),
+            ('sites', ['coolsite', 'anothercoolsite']),
+        ]
+
+
 class TestNfsnAccount(NfsnTest):
 
     def setup(self):
@@ -122,6 +239,10 @@ class TestNfsnAccount(NfsnTest):
         result = self.account.sites
         assert result == expected
 
+    def test_iter_sites(self):
+        result = list(self.account.iter_sites())
+        assert result == [ 'coolsite', 'anothercoolsite' ]
+
     def test_add_site(self):
         result = self.account.addSite(site='testing')
         assert result == ''
@@ -164,6 +285,11 @@ class TestNfsnDns(NfsnTest):
         result = self.dns.serial
         assert result == 1414129428
 
+    def test_beanbag_verbs(self):
+        from nfsn import GET, POST
+        assert GET(self.dns.beanbag.serial) == 1414129428
+        assert len(POST(self.dns.beanbag.listRRs)) == 2
+
     def test_addrr_without_ttl(self):
         result = self.dns.addRR(
             name = 'testing',
@@ -196,6 +322,35 @@ class TestNfsnDns(NfsnTest):
         result = self.dns.listRRs()
         assert result == expected
 
+    def test_listrrs_as_records(self):
+        result = self.dns.listRRs(as_records=True)
+        assert result[0] == nfsn_module.ResourceRecord(
+            '', 'A', '192.0.2.1', 3600, 'member')
+        assert result[1].type == 'NS'
+
+    def test_iter_rrs(self):
+        result = list(self.dns.iter_rrs())
+        assert result == list(self.dns.listRRs())
+
+    def test_iter_rrs_without_ijson(self, monkeypatch):
+        monkeypatch.setattr(nfsn_module.nfsnbeanbag, 'ijson', None)
+        result = list(self.dns.iter_rrs(name='foo'))
+        assert result == list(self.dns.listRRs())
+
+    def test_iter_rrs_as_records(self):
+        result = list(self.dns.iter_rrs(as_records=True))
+        assert result == self.dns.listRRs(as_records=True)
+
+    def test_iter_rrs_empty_body(self):
+        # This fixture is an empty body.
+        (base, path) = ~self.dns.beanbag.updateSerial
+        assert list(base.stream(path, 'POST')) == []
+
+    def test_zone(self):
+        zone = self.dns.zone()
+        assert len(zone) == 2
+        assert ('', 'NS') in zone
+
     def test_listrrs_with_parameters(self):
         # Don't bother checking the return values (the fixture result is not
         # really accurate). Just sanity-check that these parameters don't
@@ -216,6 +371,168 @@ class TestNfsnDns(NfsnTest):
         result = self.dns.updateSerial()
         assert result == ''
 
+    def test_sync(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        desired = [
+            {'name': '', 'type': 'A', 'data': '192.0.2.1'},
+            {'name': 'www', 'type': 'A', 'data': '192.0.2.3', 'ttl': 600},
+        ]
+        result = self.dns.sync(desired)
+        assert [rr['type'] for rr in result['removed']] == ['NS']
+        assert result['added'] == [desired[1]]
+        assert calls == [
+            ('removeRR', '', 'NS', 'ns.phx2.nearlyfreespeech.net.'),
+            ('addRR', 'www', 'A', '192.0.2.3', '600'),
+            ('updateSerial',),
+        ]
+
+    def test_sync_changed_ttl(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        desired = [
+            {'name': '', 'type': 'A', 'data': '192.0.2.1', 'ttl': 60},
+            {'name': '', 'type': 'NS',
+             'data': 'ns.phx2.nearlyfreespeech.net.', 'ttl': '3600'},
+        ]
+        self.dns.sync(desired)
+        assert calls == [
+            ('removeRR', '', 'A', '192.0.2.1'),
+            ('addRR', '', 'A', '192.0.2.1', '60'),
+            ('updateSerial',),
+        ]
+
+    def test_sync_no_changes(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        desired = [
+            {'name': '', 'type': 'A', 'data': '192.0.2.1'},
+            {'name': '', 'type': 'NS',
+             'data': 'ns.phx2.nearlyfreespeech.net.'},
+        ]
+        result = self.dns.sync(desired)
+        assert result == {'removed': [], 'added': []}
+        assert calls == []
+
+    def test_sync_records(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        desired = self.dns.listRRs(as_records=True)[:1]
+        result = self.dns.sync(desired)
+        assert result['added'] == []
+        assert calls == [
+            ('removeRR', '', 'NS', 'ns.phx2.nearlyfreespeech.net.'),
+            ('updateSerial',),
+        ]
+
+    def test_sync_dry_run(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        result = self.dns.sync([], dry_run=True)
+        assert len(result['removed']) == 2
+        assert calls == []
+
+    def test_sync_against_fixtures(self):
+        result = self.dns.sync([{'name': 'www', 'type': 'A',
+                                 'data': '192.0.2.3'}])
+        assert len(result['removed']) == 2
+        assert len(result['added']) == 1
+
+    def test_batch(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        with self.dns.batch() as batch:
+            batch.add('www', 'A', '192.0.2.3', ttl=600)
+            batch.remove('', 'A', '192.0.2.1')
+            assert calls == []
+        assert calls == [
+            ('removeRR', '', 'A', '192.0.2.1'),
+            ('addRR', 'www', 'A', '192.0.2.3', 600),
+            ('updateSerial',),
+        ]
+        assert [(op.action, outcome) for (op, outcome) in batch.results] \
+            == [('removeRR', ''), ('addRR', '')]
+
+    def test_batch_coalesces(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        with self.dns.batch() as batch:
+            batch.add('www', 'A', '192.0.2.3')
+            batch.add('www', 'A', '192.0.2.3', ttl=60)
+            batch.remove('', 'A', '192.0.2.1')
+            batch.remove('', 'A', '192.0.2.1')
+            batch.add('tmp', 'A', '192.0.2.4')
+            batch.remove('tmp', 'A', '192.0.2.4')
+            assert len(batch) == 3
+        # "tmp" is not in the zone, so there is nothing to remove.
+        assert calls == [
+            ('removeRR', '', 'A', '192.0.2.1'),
+            ('addRR', 'www', 'A', '192.0.2.3', 60),
+            ('updateSerial',),
+        ]
+
+    def test_batch_add_then_remove_existing(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        with self.dns.batch() as batch:
+            batch.add('', 'A', '192.0.2.1', ttl=60)
+            batch.remove('', 'A', '192.0.2.1')
+        assert calls == [('removeRR', '', 'A', '192.0.2.1'),
+                         ('updateSerial',)]
+
+    def test_batch_remove_then_add(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        with self.dns.batch() as batch:
+            batch.remove('', 'A', '192.0.2.1')
+            batch.add('', 'A', '192.0.2.1', ttl=60)
+        assert [call[0] for call in calls] == \
+            ['removeRR', 'addRR', 'updateSerial']
+
+    def test_batch_remove_then_add_unchanged(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        with self.dns.batch() as batch:
+            batch.remove('', 'A', '192.0.2.1')
+            batch.add('', 'A', '192.0.2.1', ttl=3600)
+            batch.remove('tmp', 'A', '192.0.2.4')
+            batch.add('tmp', 'A', '192.0.2.4')
+        assert calls == [('addRR', 'tmp', 'A', '192.0.2.4', None),
+                         ('updateSerial',)]
+
+    def test_empty_batch(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        with self.dns.batch():
+            pass
+        assert calls == []
+
+    def test_batch_not_submitted_after_exception(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        with pytest.raises(ValueError):
+            with self.dns.batch() as batch:
+                batch.add('www', 'A', '192.0.2.3')
+                raise ValueError
+        assert calls == []
+
+    def test_batch_errors(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnDns,
+                             'addRR', 'removeRR', 'updateSerial')
+        def fail(dns, *args):
+            raise RuntimeError('no such record')
+        monkeypatch.setattr(nfsn_module.NfsnDns, 'removeRR', fail)
+        batch = self.dns.batch()
+        batch.remove('', 'A', '192.0.2.9')
+        batch.add('www', 'A', '192.0.2.3')
+        with pytest.raises(RuntimeError):
+            batch.submit()
+        # The other changes were still made, and the serial updated.
+        assert calls == [('addRR', 'www', 'A', '192.0.2.3', None),
+                         ('updateSerial',)]
+        assert isinstance(batch.results[0][1], RuntimeError)
+        assert batch.results[1][1] == ''
+
 
 class TestNfsnEmail(NfsnTest):
 
@@ -226,6 +543,20 @@ class TestNfsnEmail(NfsnTest):
         result = self.email.listForwards()
         assert result == { 'hello': 'customerservice@example.net'}
 
+    def test_list_forwards_as_records(self):
+        result = self.email.listForwards(as_records=True)
+        assert result == [('hello', 'customerservice@example.net')]
+        assert result[0].dest_email == 'customerservice@example.net'
+
+    def test_iter_forwards(self):
+        result = list(self.email.iter_forwards())
+        assert result == [('hello', 'customerservice@example.net')]
+
+    def test_iter_forwards_without_ijson(self, monkeypatch):
+        monkeypatch.setattr(nfsn_module.nfsnbeanbag, 'ijson', None)
+        result = list(self.email.iter_forwards(as_records=True))
+        assert result == self.email.listForwards(as_records=True)
+
     def test_removeForward(self):
         result = self.email.removeForward(forward='hi')
         assert result == ''
@@ -234,6 +565,60 @@ class TestNfsnEmail(NfsnTest):
         result = self.email.setForward(forward='hi', dest_email='h@example.net')
         assert result == ''
 
+    def test_diff_forwards(self):
+        current = {'a': 'a@example.net', 'b': 'b@example.net',
+                   'c': 'c@example.net'}
+        desired = [('b', 'b@example.net'), ('c', 'new@example.net'),
+                   ('d', 'd@example.net')]
+        (remove, set_) = nfsn_module.diff_forwards(current, desired)
+        assert remove == ['a']
+        assert list(set_.items()) == [('c', 'new@example.net'),
+                                      ('d', 'd@example.net')]
+
+    def test_sync_forwards(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnEmail,
+                             'setForward', 'removeForward')
+        result = self.email.sync_forwards({'sales': 'sales@example.net'})
+        assert result == {'removed': ['hello'],
+                          'set': {'sales': 'sales@example.net'},
+                          'errors': {}}
+        assert sorted(calls) == [('removeForward', 'hello'),
+                                 ('setForward', 'sales', 'sales@example.net')]
+
+    def test_sync_forwards_without_prune(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnEmail,
+                             'setForward', 'removeForward')
+        result = self.email.sync_forwards(
+            [('hello', 'hello@example.org')], prune=False)
+        assert result['removed'] == []
+        assert calls == [('setForward', 'hello', 'hello@example.org')]
+
+    def test_sync_forwards_no_changes(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnEmail,
+                             'setForward', 'removeForward')
+        result = self.email.sync_forwards(
+            self.email.listForwards(as_records=True))
+        assert result == {'removed': [], 'set': {}, 'errors': {}}
+        assert calls == []
+
+    def test_sync_forwards_dry_run(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnEmail,
+                             'setForward', 'removeForward')
+        result = self.email.sync_forwards({}, dry_run=True)
+        assert result['removed'] == ['hello']
+        assert calls == []
+
+    def test_sync_forwards_errors(self, monkeypatch):
+        calls = record_calls(monkeypatch, nfsn_module.NfsnEmail,
+                             'setForward', 'removeForward')
+        def fail(email, forward):
+            raise RuntimeError('no such forward')
+        monkeypatch.setattr(nfsn_module.NfsnEmail, 'removeForward', fail)
+        result = self.email.sync_forwards({'sales': 'sales@example.net'})
+        assert list(result['errors']) == ['hello']
+        assert isinstance(result['errors']['hello'], RuntimeError)
+        assert calls == [('setForward', 'sales', 'sales@example.net')]
+
 
 class TestNfsnMember(NfsnTest):
 
@@ -248,6 +633,10 @@ class TestNfsnMember(NfsnTest):
         result = self.member.sites
         assert result == [ 'coolsite', 'anothercoolsite' ]
 
+    def test_iter_sites(self):
+        result = list(self.member.iter_sites())
+        assert result == [ 'coolsite', 'anothercoolsite' ]
+
 
 class TestNfsnSite(NfsnTest):
 
@@ -261,3 +650,23 @@ class TestNfsnSite(NfsnTest):
     def test_remove_alias(self):
         result = self.site.removeAlias(alias='mobile.example.com')
         assert result == ''
+
+
+class TestDiffRRs(object):
+
+    current = [
+        {'name': '', 'type': 'A', 'data': '192.0.2.1', 'ttl': '3600',
+         'scope': 'member'},
+        {'name': 'www', 'type': 'CNAME', 'data': 'example.nfshost.com.',
+         'ttl': '600', 'scope': 'system'},
+    ]
+
+    def test_system_records_are_never_removed(self):
+        (remove, add) = nfsn_module.diff_rrs(self.current, [])
+        assert remove == [self.current[0]]
+        assert add == []
+
+    def test_duplicate_desired_records(self):
+        desired = [{'name': 'a', 'type': 'A', 'data': '192.0.2.2'}] * 2
+        (remove, add) = nfsn_module.diff_rrs(self.current, desired)
+        assert add == desired[:1]
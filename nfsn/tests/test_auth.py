@@ -37,3 +37,24 @@ class TestNfsnAuth(object):
         expected = 'testlogin;1000000;yumsalty1234;d20e2ee4105b82060f4c0ea9c2d9a91a3b6cdd13'
         r_authenticated = self.auth(r.prepare())
         assert r_authenticated.headers['X-NFSN-Authentication'] == expected
+
+    def test_salt_distribution(self):
+        """ every salt character is possible """
+        seen = set()
+        for _ in range(200):
+            seen.update(self.auth._salt())
+        assert seen == set(NfsnAuth.SALT_CHARACTERS)
+
+    def test_header_with_body(self, monkeypatch):
+        monkeypatch.setattr(time, 'time', lambda: '1000000')
+        monkeypatch.setattr(self.auth, '_salt', lambda: 'yumsalty1234')
+        text = self.auth.header('/dns/example.com/addRR', 'name=www')
+        raw = self.auth.header('/dns/example.com/addRR', b'name=www')
+        assert text == raw
+        assert text != self.auth.header('/dns/example.com/addRR', '')
+
+    def test_header_empty_body(self, monkeypatch):
+        monkeypatch.setattr(time, 'time', lambda: '1000000')
+        monkeypatch.setattr(self.auth, '_salt', lambda: 'yumsalty1234')
+        assert self.auth.header('/testing', None) == \
+            self.auth.header('/testing', b'')
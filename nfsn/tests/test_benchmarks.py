@@ -0,0 +1,386 @@
+""" Benchmarks for the client's hot paths. Where a code path replaced an
+older implementation, the benchmark checks that it is faster.
+
+Timings depend on the machine and its load, so the timed benchmarks only run
+when $NFSN_BENCHMARKS is set (eg. to 1), or $NFSN_BENCHMARK_JSON is set to a
+filename to save the results as JSON, eg. to compare them between commits.
+The checks that old and new code paths give the same results always run. """
+from beanbag.v2 import BeanBag
+import hashlib
+import json
+import logging
+import nfsn as nfsn_module
+from nfsn import Nfsn
+from nfsn.auth import NfsnAuth
+from nfsn.mockserver import MockNfsnServer
+from nfsn.nfsnbeanbag import NfsnBeanBag
+from nfsn.pool import ConnectionPool
+import os
+import platform
+import pytest
+import random
+import requests
+import subprocess
+import sys
+import time
+import timeit
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    # Python 2
+    from urlparse import urlparse
+
+
+# Benchmark name -> dict of measurements
+RESULTS = {}
+
+# Mark the tests that time things.
+timed = pytest.mark.skipif(
+    not (os.environ.get('NFSN_BENCHMARKS') or
+         os.environ.get('NFSN_BENCHMARK_JSON')),
+    reason='set $NFSN_BENCHMARKS to run the timed benchmarks')
+
+
+pytestmark = pytest.mark.usefixtures('real_sockets')
+
+
+def teardown_module(module):
+    filename = os.environ.get('NFSN_BENCHMARK_JSON')
+    if filename and RESULTS:
+        with open(filename, 'w') as results_file:
+            json.dump({'python': platform.python_version(),
+                       'results': RESULTS},
+                      results_file, indent=2, sort_keys=True)
+
+
+def report(name, **measurements):
+    """ Record (and print) a benchmark's results. """
+    RESULTS[name] = measurements
+    print('%s: %s' % (name, ', '.join('%s=%.4g' % item for item in
+                                      sorted(measurements.items()))))
+
+
+def best_time(function, number=20, repeat=5):
+    """ Return the fastest time (in seconds) for "number" calls. """
+    return min(timeit.repeat(function, number=number, repeat=repeat))
+
+
+def per_call_us(function, number=1000):
+    """ Return the fastest time for one call, in microseconds. """
+    return best_time(function, number) * 1e6 / number
+
+
+def listrrs_response(count=5000):
+    rrs = [{'data': '192.0.2.%d' % (i % 256),
+            'name': 'host%d' % i,
+            'scope': 'member',
+            'ttl': '3600',
+            'type': 'A'} for i in range(count)]
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(rrs).encode('utf-8')
+    response.headers['content-type'] = 'application/x-nfsn-api'
+    return response
+
+
+class TestDecodeBenchmark(object):
+
+    def setup(self):
+        (self.nfsn_base, _) = ~NfsnBeanBag('https://api.example.net/')
+        (self.beanbag_base, _) = ~BeanBag('https://api.example.net/')
+        self.response = listrrs_response()
+
+    def two_pass_decode(self):
+        """ The old NfsnBeanBag.decode(): test-parse the body, then let
+        BeanBag parse it again. """
+        response = self.response
+        json.loads(response.content.decode('utf-8'))
+        response.headers['content-type'] = 'application/x-nfsn-api'
+        if response.headers.get('content-type') == 'application/x-nfsn-api':
+            response.headers['content-type'] = 'application/json'
+        return self.beanbag_base.decode(response)
+
+    def test_decode_results_match(self):
+        assert self.nfsn_base.decode(self.response) == self.two_pass_decode()
+
+    @timed
+    def test_single_pass_decode_is_faster(self):
+        old = best_time(self.two_pass_decode)
+        new = best_time(lambda: self.nfsn_base.decode(self.response))
+        report('decode_5000_rrs', two_pass_ms=old * 1000 / 20,
+               single_pass_ms=new * 1000 / 20)
+        assert new < old
+
+
+class OldNfsnAuth(NfsnAuth):
+    """ The signing path before it was optimized: a new SystemRandom for
+    each salt character, urlparse(), and eager debug logging. """
+
+    log = logging.getLogger('nfsn.auth')
+
+    def _header(self, r):
+        log = self.log
+        login = self.login
+        timestamp = self._timestamp()
+        salt = self._salt()
+        api_key = self.api_key
+        request_uri = urlparse(r.url).path
+        body = ''.encode('utf-8')
+        if r.body:
+            body = r.body.encode('utf-8')
+        body_hash = hashlib.sha1(body).hexdigest()
+        log.debug("login: %s", login)
+        log.debug("timestamp: %s", timestamp)
+        log.debug("salt: %s", salt)
+        log.debug("api_key: %s", api_key)
+        log.debug("request_uri: %s", request_uri)
+        log.debug("body_hash: %s", body_hash)
+        string = ';'.join((login, timestamp, salt, api_key, request_uri,
+                           body_hash))
+        log.debug("string to be hashed: %s", string)
+        string_hash = hashlib.sha1(string.encode('utf-8')).hexdigest()
+        log.debug("string_hash: %s", string_hash)
+        return ';'.join((login, timestamp, salt, string_hash))
+
+    def _salt(self):
+        return ''.join(random.SystemRandom().choice(self.SALT_CHARACTERS)
+                       for _ in range(16))
+
+
+class TestSigningBenchmark(object):
+
+    def setup(self):
+        url = 'https://api.nearlyfreespeech.net/dns/example.com/listRRs'
+        self.request = requests.Request('POST', url,
+                                        data={'name': 'www'}).prepare()
+        self.old = OldNfsnAuth('testlogin', 'testapikey123')
+        self.new = NfsnAuth('testlogin', 'testapikey123')
+
+    def test_signatures_match(self, monkeypatch):
+        monkeypatch.setattr(time, 'time', lambda: 1000000)
+        monkeypatch.setattr(self.old, '_salt', lambda: 'yumsalty1234')
+        monkeypatch.setattr(self.new, '_salt', lambda: 'yumsalty1234')
+        assert self.new._header(self.request) == \
+            self.old._header(self.request)
+
+    @timed
+    def test_signing_is_faster(self):
+        number = 2000
+        old = best_time(lambda: self.old._header(self.request), number)
+        new = best_time(lambda: self.new._header(self.request), number)
+        report('signing', old_per_second=number / old,
+               new_per_second=number / new)
+        assert new < old
+
+
+def run_python(*args):
+    """ Run a new Python interpreter with this checkout on sys.path, and
+    return its (stdout, stderr). """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + [p for p in [os.environ.get('PYTHONPATH')] if p])
+    process = subprocess.Popen((sys.executable,) + args, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (out, err) = process.communicate()
+    assert process.returncode == 0, err
+    return (out.decode('utf-8'), err.decode('utf-8'))
+
+
+class TestStartupBenchmark(object):
+
+    # Modules that "pynfsn" should not load just to print its help.
+    HEAVY_MODULES = ('requests', 'beanbag', 'beanbag.v2', 'sqlite3',
+                     'concurrent.futures')
+
+    def test_help_does_not_import_heavy_modules(self):
+        code = ('import json, sys\n'
+                'before = set(sys.modules)\n'
+                'import nfsn.cli\n'
+                'nfsn.cli.main(["pynfsn"])\n'
+                'print(json.dumps(sorted(set(sys.modules) - before)))\n')
+        (out, _) = run_python('-c', code)
+        imported = json.loads(out.splitlines()[-1])
+        assert 'nfsn.cli' in imported
+        for module in self.HEAVY_MODULES:
+            assert module not in imported
+
+    @timed
+    @pytest.mark.skipif(sys.version_info < (3, 7),
+                        reason='python -X importtime needs Python 3.7')
+    def test_import_time(self):
+        (_, err) = run_python('-X', 'importtime', '-c',
+                              'import nfsn.cli; import requests')
+        # Lines look like "import time:  self [us] | cumulative | name"
+        cumulative = {}
+        for line in err.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                cumulative[fields[2].strip()] = int(fields[1])
+        report('import_time', nfsn_cli_us=cumulative['nfsn.cli'],
+               requests_us=cumulative['requests'])
+        assert cumulative['nfsn.cli'] < cumulative['requests']
+
+
+@timed
+class TestCodecBenchmark(object):
+
+    def setup(self):
+        (self.base, _) = ~NfsnBeanBag('https://api.example.net/')
+
+    def test_encode(self):
+        small = {'name': 'www'}
+        large = dict(('key%d' % i, 'value%d' % i) for i in range(1000))
+        assert self.base.encode(small).data == small
+        report('encode', small_us=per_call_us(lambda: self.base.encode(small)),
+               large_us=per_call_us(lambda: self.base.encode(large), 100))
+
+    def test_decode(self):
+        small = listrrs_response(1)
+        large = listrrs_response(20000)
+        assert len(self.base.decode(large)) == 20000
+        report('decode', small_us=per_call_us(lambda: self.base.decode(small)),
+               large_ms=best_time(lambda: self.base.decode(large), 5) *
+               1000 / 5)
+
+
+@timed
+class TestDispatchBenchmark(object):
+    """ The cost of NfsnObject itself, without any HTTP. """
+
+    def setup(self):
+        self.nfsn = Nfsn(login='guest', api_key='1234567890123456')
+
+    def test_dispatch(self, monkeypatch):
+        # Return the BeanBag path instead of making a request.
+        monkeypatch.setattr(nfsn_module, '_call',
+                            lambda verb, base, path, body=None: path)
+        dns = self.nfsn.dns('example.com')
+        report('dispatch',
+               construct_us=per_call_us(lambda: self.nfsn.dns('example.com')),
+               getattr_us=per_call_us(lambda: dns.serial),
+               method_us=per_call_us(lambda: dns.listRRs(name='www')))
+
+
+class CannedAdapter(requests.adapters.BaseAdapter):
+    """ Answer every request with the same small response, without any
+    network I/O. """
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'1414129428'
+        response.headers['content-type'] = 'application/x-nfsn-api'
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def peak_memory(function):
+    """ Return the most memory (in bytes) that one call of function()
+    allocates at once. """
+    tracemalloc = pytest.importorskip('tracemalloc')
+    function()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class TestTransportBenchmark(object):
+    """ The cost of a whole call, including requests, with each transport,
+    but with a canned response instead of HTTP. """
+
+    def nfsn(self, transport):
+        pool = ConnectionPool()
+        pool.session.mount('https://', CannedAdapter())
+        return Nfsn(login='guest', api_key='1234567890123456',
+                    transport=transport, pool=pool)
+
+    def test_results_match(self):
+        results = [self.nfsn(transport).dns('example.com').serial
+                   for transport in ('beanbag', 'direct')]
+        assert results == [1414129428, 1414129428]
+
+    @timed
+    def test_direct_transport_is_faster(self):
+        calls = {}
+        for transport in ('beanbag', 'direct'):
+            dns = self.nfsn(transport).dns('example.com')
+            calls[transport] = lambda dns=dns: dns.listRRs(name='www')
+        beanbag_us = per_call_us(calls['beanbag'], 200)
+        direct_us = per_call_us(calls['direct'], 200)
+        beanbag_bytes = peak_memory(calls['beanbag'])
+        direct_bytes = peak_memory(calls['direct'])
+        report('transport', beanbag_us=beanbag_us, direct_us=direct_us,
+               beanbag_peak_bytes=beanbag_bytes,
+               direct_peak_bytes=direct_bytes)
+        assert direct_us < beanbag_us
+        assert direct_bytes <= beanbag_bytes
+
+
+@timed
+class TestThroughputBenchmark(object):
+    """ End-to-end calls against a local MockNfsnServer. Each response takes
+    at least "latency" seconds, like a (fast) real network. """
+
+    calls = 100
+    latency = 0.005
+
+    def setup(self):
+        self.server = MockNfsnServer(latency=self.latency).start()
+        self.domains = ['example%d.com' % i for i in range(self.calls)]
+        for domain in self.domains:
+            self.server.add_zone(domain, serial=1)
+
+    def teardown(self):
+        self.server.stop()
+
+    def nfsn(self):
+        return Nfsn(login=self.server.login, api_key=self.server.api_key,
+                    endpoint=self.server.url)
+
+    def test_throughput(self):
+        nfsn = self.nfsn()
+        start = time.time()
+        serials = [nfsn.dns(domain).serial for domain in self.domains]
+        sequential = time.time() - start
+        assert serials == [1] * self.calls
+
+        start = time.time()
+        results = nfsn.map('dns', self.domains, 'serial', max_workers=8)
+        threaded = time.time() - start
+        assert list(results.values()) == [1] * self.calls
+
+        report('throughput', calls=self.calls, latency=self.latency,
+               sequential_per_second=self.calls / sequential,
+               threaded_per_second=self.calls / threaded)
+        assert threaded < sequential
+
+    def test_asyncio_throughput(self):
+        pytest.importorskip('aiohttp')
+        import asyncio
+        from nfsn.aio import AsyncNfsn
+        nfsn = AsyncNfsn(login=self.server.login,
+                         api_key=self.server.api_key,
+                         endpoint=self.server.url)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            start = time.time()
+            serials = loop.run_until_complete(asyncio.gather(
+                *[nfsn.dns(domain).serial for domain in self.domains]))
+            concurrent = time.time() - start
+            loop.run_until_complete(nfsn.close())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        assert list(serials) == [1] * self.calls
+        report('asyncio_throughput', calls=self.calls, latency=self.latency,
+               concurrent_per_second=self.calls / concurrent)
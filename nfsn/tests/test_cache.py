@@ -0,0 +1,111 @@
+from nfsn.cache import DiskCache, ResponseCache
+import pytest
+import time
+
+
+class TestResponseCache(object):
+
+    def setup(self):
+        self.cache = ResponseCache(ttl=60, ttls={'dns': 300}, max_size=3)
+        self.key = ('dns', 'example.com', 'serial', ())
+
+    def test_get_missing(self):
+        with pytest.raises(KeyError):
+            self.cache.get(self.key)
+
+    def test_set_and_get(self):
+        self.cache.set(self.key, 1414129428)
+        assert self.cache.get(self.key) == 1414129428
+
+    def test_expiry(self, monkeypatch):
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now)
+        self.cache.set(self.key, 1414129428)
+        monkeypatch.setattr(time, 'time', lambda: now + 301)
+        with pytest.raises(KeyError):
+            self.cache.get(self.key)
+
+    def test_per_object_type_ttl(self, monkeypatch):
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now)
+        account_key = ('account', 'A1B2-C3D4E5F6', 'balance', ())
+        self.cache.set(self.key, 1414129428)
+        self.cache.set(account_key, 9.04)
+        monkeypatch.setattr(time, 'time', lambda: now + 120)
+        assert self.cache.get(self.key) == 1414129428
+        with pytest.raises(KeyError):
+            self.cache.get(account_key)
+
+    def test_lru_eviction(self):
+        keys = [('dns', 'example.com', action, ())
+                for action in ('serial', 'expire', 'retry', 'refresh')]
+        for key in keys[:3]:
+            self.cache.set(key, 1)
+        # Use the oldest entry, so the second-oldest one is evicted instead.
+        self.cache.get(keys[0])
+        self.cache.set(keys[3], 1)
+        assert len(self.cache) == 3
+        self.cache.get(keys[0])
+        with pytest.raises(KeyError):
+            self.cache.get(keys[1])
+
+    def test_invalidate(self):
+        other_key = ('dns', 'example.net', 'serial', ())
+        self.cache.set(self.key, 1)
+        self.cache.set(other_key, 2)
+        self.cache.invalidate('dns', 'example.com')
+        with pytest.raises(KeyError):
+            self.cache.get(self.key)
+        assert self.cache.get(other_key) == 2
+
+
+class TestDiskCache(object):
+
+    key = ('dns', 'example.com', 'listRRs', (('name', 'www'),))
+    rrs = [{'name': 'www', 'type': 'A', 'data': '192.0.2.1'}]
+
+    def test_set_and_get(self, tmpdir):
+        cache = DiskCache(str(tmpdir.join('cache.sqlite')))
+        cache.set(self.key, self.rrs)
+        assert cache.get(self.key) == self.rrs
+        assert cache.get(self.key)[0].name == 'www'
+
+    def test_shared_between_instances(self, tmpdir):
+        path = str(tmpdir.join('cache.sqlite'))
+        DiskCache(path).set(self.key, 'Personal')
+        assert DiskCache(path).get(self.key) == 'Personal'
+
+    def test_creates_directory(self, tmpdir):
+        path = tmpdir.join('nfsn', 'cache.sqlite')
+        DiskCache(str(path))
+        assert path.check()
+
+    def test_expiry(self, tmpdir, monkeypatch):
+        cache = DiskCache(str(tmpdir.join('cache.sqlite')), ttl=10)
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now)
+        cache.set(self.key, self.rrs)
+        monkeypatch.setattr(time, 'time', lambda: now + 11)
+        with pytest.raises(KeyError):
+            cache.get(self.key)
+
+    def test_refresh(self, tmpdir):
+        path = str(tmpdir.join('cache.sqlite'))
+        cache = DiskCache(path, refresh=True)
+        cache.set(self.key, self.rrs)
+        with pytest.raises(KeyError):
+            cache.get(self.key)
+        assert DiskCache(path).get(self.key) == self.rrs
+
+    def test_invalidate(self, tmpdir):
+        cache = DiskCache(str(tmpdir.join('cache.sqlite')))
+        cache.set(self.key, self.rrs)
+        cache.set(('email', 'example.com', 'listForwards', ()), {})
+        cache.invalidate('dns', 'example.com')
+        assert len(cache) == 1
+
+    def test_max_size(self, tmpdir):
+        cache = DiskCache(str(tmpdir.join('cache.sqlite')), max_size=2)
+        for action in ('serial', 'expire', 'retry'):
+            cache.set(('dns', 'example.com', action, ()), 1)
+        assert len(cache) == 2
@@ -1,5 +1,11 @@
+import json
 import nfsn.cli
+import pytest
 import sys
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
 class TestNfsnCliHelp(object):
 
@@ -36,8 +42,28 @@ class DummyNfsnDns(object):
     def listRRs(self):
         return [{'data': 'www.example.com'}]
 
+class DummyMultiNfsn(object):
+    def dns(self, domain):
+        return DummyMultiNfsnDns(domain)
+
+class DummyMultiNfsnDns(object):
+    def __init__(self, domain):
+        self.domain = domain
+    @property
+    def serial(self):
+        if self.domain == 'broken.example':
+            raise RuntimeError('no such domain')
+        return len(self.domain)
+    def listRRs(self, name=None):
+        return [{'name': name, 'data': self.domain}]
+
 class TestNfsnCli(object):
 
+    @pytest.fixture(autouse=True)
+    def cache_home(self, monkeypatch, tmpdir):
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+        return tmpdir
+
     def test_dns_expires(self, monkeypatch, capsys):
         monkeypatch.setattr(nfsn, 'Nfsn', DummyNfsn)
         nfsn.cli.main(['pynfsn', 'dns', 'example.com', 'expires'])
@@ -49,3 +75,98 @@ class TestNfsnCli(object):
         nfsn.cli.main(['pynfsn', 'dns', 'example.com', 'listRRs'])
         (out, _) = capsys.readouterr()
         return out == str([{'data': 'www.example.com'}])
+
+    def test_disk_cache(self, monkeypatch, cache_home):
+        monkeypatch.setattr(nfsn, 'Nfsn', DummyNfsn)
+        nfsn.cli.main(['pynfsn', 'dns', 'example.com', 'expires'])
+        assert cache_home.join('nfsn', 'responses.sqlite').check()
+
+    def test_no_cache(self, monkeypatch, capsys, cache_home):
+        monkeypatch.setattr(nfsn, 'Nfsn', DummyNfsn)
+        nfsn.cli.main(['pynfsn', '--no-cache', 'dns', 'example.com',
+                       'expires'])
+        (out, _) = capsys.readouterr()
+        assert out == "864000\n"
+        assert not cache_home.join('nfsn').check()
+
+    def test_refresh(self, monkeypatch):
+        instances = []
+        class RecordingNfsn(DummyNfsn):
+            def __init__(self):
+                instances.append(self)
+        monkeypatch.setattr(nfsn, 'Nfsn', RecordingNfsn)
+        nfsn.cli.main(['pynfsn', '--refresh', 'dns', 'example.com',
+                       'expires'])
+        assert instances[0].cache.refresh is True
+
+    def test_options_stop_at_the_command(self):
+        (options, args) = nfsn.cli._parse_options(
+            ['-j', '2', 'dns', 'example.com', 'addRR', 'x', 'TXT',
+             '--refresh'])
+        assert options['jobs'] == 2
+        assert options['refresh'] is False
+        assert args == ['dns', 'example.com', 'addRR', 'x', 'TXT',
+                        '--refresh']
+
+    def test_end_of_options(self):
+        (options, args) = nfsn.cli._parse_options(['--no-cache', '--', '-j'])
+        assert options['cache'] is False
+        assert args == ['-j']
+
+
+class TestNfsnCliMulti(object):
+
+    @pytest.fixture(autouse=True)
+    def dummy_nfsn(self, monkeypatch):
+        monkeypatch.setattr(nfsn, 'Nfsn', DummyMultiNfsn)
+
+    def json_lines(self, capsys):
+        (out, _) = capsys.readouterr()
+        return [json.loads(line) for line in out.splitlines()]
+
+    def test_comma_separated_ids(self, capsys):
+        nfsn.cli.main(['pynfsn', '--no-cache', '-j', '2', 'dns',
+                       'example.com,example.net', 'listRRs', 'www'])
+        assert self.json_lines(capsys) == [
+            {'object': 'dns', 'id': 'example.com', 'action': 'listRRs',
+             'result': [{'name': 'www', 'data': 'example.com'}]},
+            {'object': 'dns', 'id': 'example.net', 'action': 'listRRs',
+             'result': [{'name': 'www', 'data': 'example.net'}]},
+        ]
+
+    def test_ids_from_stdin(self, monkeypatch, capsys):
+        monkeypatch.setattr(sys, 'stdin', StringIO('a.example\n\nbb.example\n'))
+        nfsn.cli.main(['pynfsn', '--no-cache', 'dns', '-', 'serial'])
+        lines = self.json_lines(capsys)
+        assert [(l['id'], l['result']) for l in lines] == [
+            ('a.example', 9), ('bb.example', 10)]
+
+    def test_commands_file(self, capsys, tmpdir):
+        commands = tmpdir.join('commands')
+        commands.write('# comment\n'
+                       'dns example.com serial\n'
+                       'dns example.net listRRs www\n')
+        nfsn.cli.main(['pynfsn', '--no-cache', '--commands', str(commands)])
+        lines = self.json_lines(capsys)
+        assert [(l['id'], l['action']) for l in lines] == [
+            ('example.com', 'serial'), ('example.net', 'listRRs')]
+
+    def test_commands_file_and_short_command(self, tmpdir):
+        commands = tmpdir.join('commands')
+        commands.write('dns example.com serial\n')
+        with pytest.raises(SystemExit):
+            nfsn.cli.main(['pynfsn', '--no-cache', '--commands',
+                           str(commands), 'dns', 'example.com'])
+
+    def test_errors(self, capsys):
+        result = nfsn.cli.main(['pynfsn', '--no-cache', '--jobs=4', 'dns',
+                                'example.com,broken.example', 'serial'])
+        lines = self.json_lines(capsys)
+        assert lines[0]['result'] == 11
+        assert lines[1]['error'] == 'no such domain'
+        assert result == 1
+
+    def test_bad_jobs(self):
+        with pytest.raises(SystemExit):
+            nfsn.cli.main(['pynfsn', '--jobs', 'many', 'dns', 'example.com',
+                           'serial'])
@@ -0,0 +1,155 @@
+import httpretty
+from nfsn import Nfsn
+from nfsn import metrics as metrics_module
+from nfsn import retry
+from nfsn.metrics import EndpointStats, Metrics
+import pytest
+import requests
+
+
+class FakeClock(object):
+    """ Replace the monotonic clock, so that each request takes "step"
+    seconds. """
+
+    def __init__(self, monkeypatch, step=0.1):
+        self.now = 1000.0
+        self.step = step
+        monkeypatch.setattr(metrics_module, '_now', self.tick)
+
+    def tick(self):
+        self.now += self.step
+        return self.now
+
+
+def record(metrics, object_name='dns', action='listRRs', status_code=200,
+           bytes_in=0, bytes_out=0):
+    started = metrics.request_started('POST', object_name, action)
+    metrics.request_finished(started, 'POST', object_name, action,
+                             status_code, bytes_in, bytes_out)
+
+
+class TestEndpointStats(object):
+
+    def test_empty(self):
+        assert EndpointStats().quantile(0.5) is None
+
+    def test_quantiles(self):
+        stats = EndpointStats(buckets=(1, 2, float('inf')))
+        for seconds in (0.5, 0.5, 1.5, 1.5):
+            stats.observe(seconds)
+        assert stats.quantile(0.5) == 1
+        assert stats.quantile(0.75) == 1.5
+        assert stats.quantile(1) == 2
+
+    def test_slowest_bucket(self):
+        stats = EndpointStats(buckets=(1, float('inf')))
+        stats.observe(60)
+        assert stats.quantile(0.99) == 1
+
+
+class TestMetrics(object):
+
+    def test_counts(self, monkeypatch):
+        FakeClock(monkeypatch, step=0.02)
+        metrics = Metrics()
+        record(metrics, bytes_in=100, bytes_out=10)
+        record(metrics, bytes_in=50, bytes_out=10)
+        record(metrics, status_code=503)
+        record(metrics, object_name='account', action='balance')
+        stats = metrics.as_dict()
+        assert sorted(stats) == ['account', 'dns']
+        listrrs = stats['dns']['listRRs']
+        assert listrrs['requests'] == 3
+        assert listrrs['errors'] == 1
+        assert listrrs['bytes_in'] == 150
+        assert listrrs['bytes_out'] == 20
+        assert listrrs['statuses'] == {'200': 2, '503': 1}
+        assert listrrs['seconds'] == pytest.approx(0.06)
+        assert 0.01 < listrrs['p50'] <= 0.025
+        assert listrrs['p50'] <= listrrs['p95'] <= listrrs['p99']
+
+    def test_hooks(self):
+        calls = []
+        metrics = Metrics()
+        metrics.add_hook(before=lambda *args: calls.append(('before', args)),
+                         after=lambda *args: calls.append(('after',
+                                                           args[:4])))
+        record(metrics)
+        assert calls == [('before', ('POST', 'dns', 'listRRs')),
+                         ('after', ('POST', 'dns', 'listRRs', 200))]
+
+    def test_failed_request(self):
+        metrics = Metrics()
+        started = metrics.request_started('GET', 'dns', 'serial')
+        metrics.request_finished(started, 'GET', 'dns', 'serial',
+                                 exception=requests.ConnectionError())
+        stats = metrics.as_dict()['dns']['serial']
+        assert stats['errors'] == 1
+        assert stats['statuses'] == {}
+        assert 'status="none"} 1' in metrics.prometheus()
+
+    def test_reset(self):
+        metrics = Metrics()
+        record(metrics)
+        metrics.reset()
+        assert metrics.as_dict() == {}
+
+    def test_prometheus(self, monkeypatch):
+        FakeClock(monkeypatch, step=0.2)
+        metrics = Metrics(buckets=(0.1, 1))
+        record(metrics, bytes_in=100)
+        metrics.retried('dns', 'listRRs')
+        lines = metrics.prometheus().splitlines()
+        labels = 'object="dns",action="listRRs"'
+        assert '# TYPE nfsn_requests_total counter' in lines
+        assert 'nfsn_requests_total{%s,status="200"} 1' % labels in lines
+        assert 'nfsn_retries_total{%s} 1' % labels in lines
+        assert 'nfsn_response_bytes_total{%s} 100' % labels in lines
+        assert '# TYPE nfsn_request_duration_seconds histogram' in lines
+        for (le, count) in (('0.1', 0), ('1', 1), ('+Inf', 1)):
+            assert 'nfsn_request_duration_seconds_bucket{%s,le="%s"} %d' % \
+                (labels, le, count) in lines
+        assert 'nfsn_request_duration_seconds_count{%s} 1' % labels in lines
+
+
+class TestNfsnMetrics(object):
+
+    api = 'https://api.nearlyfreespeech.net/dns/example.com/'
+
+    @httpretty.activate
+    def test_requests_are_recorded(self):
+        httpretty.register_uri(httpretty.POST, self.api + 'listRRs',
+                               body='[]',
+                               content_type='application/x-nfsn-api')
+        httpretty.register_uri(httpretty.GET, self.api + 'serial',
+                               body='1414129428',
+                               content_type='application/x-nfsn-api')
+        nfsn = Nfsn(login='guest', api_key='1234567890123456', metrics=True)
+        dns = nfsn.dns('example.com')
+        dns.listRRs(name='www')
+        dns.serial
+        stats = nfsn.metrics.as_dict()['dns']
+        assert stats['listRRs']['requests'] == 1
+        assert stats['listRRs']['bytes_in'] == 2
+        assert stats['listRRs']['bytes_out'] == len('name=www')
+        assert stats['serial']['requests'] == 1
+        assert stats['serial']['statuses'] == {'200': 1}
+
+    @httpretty.activate
+    def test_retries_are_recorded(self, monkeypatch):
+        monkeypatch.setattr(retry.time, 'sleep', lambda seconds: None)
+        content_type = 'application/x-nfsn-api'
+        responses = [
+            httpretty.Response(status=503, body='{"error": "Unavailable"}',
+                               content_type=content_type),
+            httpretty.Response(body='1414129428', content_type=content_type),
+        ]
+        httpretty.register_uri(httpretty.GET, self.api + 'serial',
+                               responses=responses)
+        nfsn = Nfsn(login='guest', api_key='1234567890123456', retry=True,
+                    metrics=True)
+        assert nfsn.dns('example.com').serial == 1414129428
+        stats = nfsn.metrics.as_dict()['dns']['serial']
+        assert stats['requests'] == 2
+        assert stats['errors'] == 1
+        assert stats['retries'] == 1
@@ -0,0 +1,137 @@
+from beanbag.v2 import BeanBagException
+from nfsn import Nfsn
+from nfsn import retry
+from nfsn.mockserver import MockNfsnServer
+import pytest
+import requests
+
+
+pytestmark = pytest.mark.usefixtures('real_sockets')
+
+
+class TestMockNfsnServer(object):
+
+    def setup(self):
+        self.server = MockNfsnServer().start()
+        self.nfsn = Nfsn(login=self.server.login,
+                         api_key=self.server.api_key,
+                         endpoint=self.server.url)
+
+    def teardown(self):
+        self.server.stop()
+
+    def test_fixtures(self):
+        assert self.nfsn.account('A1B2-C3D4E5F6').balance == 9.04
+        assert self.nfsn.member('guest').sites == ['coolsite',
+                                                   'anothercoolsite']
+        assert self.server.requests == 2
+
+    def test_not_found(self):
+        with pytest.raises(BeanBagException) as e:
+            self.nfsn.account('no-such-account').balance
+        assert e.value.response.status_code == 404
+
+    def test_bad_api_key(self):
+        nfsn = Nfsn(login=self.server.login, api_key='wrongkey12345678',
+                    endpoint=self.server.url)
+        with pytest.raises(RuntimeError):
+            nfsn.dns('example.com').serial
+
+    def test_missing_header(self):
+        response = requests.get(self.server.url + '/dns/example.com/serial')
+        assert response.status_code == 401
+
+    def test_dns_changes(self):
+        dns = self.nfsn.dns('example.com')
+        serial = dns.serial
+        dns.addRR('www', 'A', '192.0.2.2', ttl=300)
+        assert +dns.listRRs(name='www') == [
+            {'name': 'www', 'type': 'A', 'data': '192.0.2.2', 'ttl': '300',
+             'scope': 'member'}]
+        dns.removeRR('www', 'A', '192.0.2.2')
+        assert +dns.listRRs(name='www') == []
+        dns.updateSerial()
+        assert dns.serial == serial + 1
+
+    def test_duplicate_rr(self):
+        dns = self.nfsn.dns('example.com')
+        with pytest.raises(BeanBagException) as e:
+            dns.addRR('', 'A', '192.0.2.1')
+        assert e.value.response.status_code == 400
+
+    def test_dns_batch(self):
+        dns = self.nfsn.dns('example.com')
+        serial = dns.serial
+        with dns.batch() as batch:
+            for i in range(10):
+                batch.add('host%d' % i, 'A', '192.0.2.%d' % (i + 10))
+            batch.remove('', 'A', '192.0.2.1')
+        assert len(dns.listRRs(type='A')) == 10
+        assert dns.serial == serial + 1
+
+    def test_dns_batch_last_change_wins(self):
+        dns = self.nfsn.dns('example.com')
+        with dns.batch() as batch:
+            batch.add('', 'A', '192.0.2.1')
+            batch.remove('', 'A', '192.0.2.1')
+        assert +dns.listRRs(type='A') == []
+
+    def test_dns_batch_cancelled_add(self):
+        dns = self.nfsn.dns('example.com')
+        serial = dns.serial
+        with dns.batch() as batch:
+            batch.add('www', 'A', '192.0.2.2')
+            batch.remove('www', 'A', '192.0.2.2')
+        assert batch.results == []
+        assert +dns.listRRs(name='www') == []
+        assert dns.serial == serial
+
+    def test_sync_forwards(self):
+        email = self.nfsn.email('example.com')
+        desired = dict(('alias%d' % i, 'user%d@example.net' % i)
+                       for i in range(20))
+        result = email.sync_forwards(desired)
+        assert result['removed'] == ['hello']
+        assert result['errors'] == {}
+        assert +email.listForwards() == desired
+
+    def test_add_zone(self):
+        self.server.add_zone('example.net', [
+            {'name': 'www', 'type': 'A', 'data': '192.0.2.3'}])
+        dns = self.nfsn.dns('example.net')
+        assert dns.serial == 1
+        assert dns.listRRs(as_records=True)[0].ttl == 3600
+
+    def test_forwards(self):
+        email = self.nfsn.email('example.com')
+        email.setForward('sales', 'sales@example.net')
+        email.removeForward('hello')
+        assert +email.listForwards() == {'sales': 'sales@example.net'}
+        assert self.server.forwards('example.com') == \
+            {'sales': 'sales@example.net'}
+
+    def test_properties(self):
+        dns = self.nfsn.dns('example.com')
+        assert dns.expire == 86400
+        dns.expire = 86401
+        assert dns.expire == 86401
+
+    def test_injected_errors(self, monkeypatch):
+        monkeypatch.setattr(retry.time, 'sleep', lambda seconds: None)
+        self.server.inject_errors(503, 429)
+        nfsn = Nfsn(login=self.server.login, api_key=self.server.api_key,
+                    endpoint=self.server.url, retry=True)
+        assert nfsn.dns('example.com').serial == 1414129428
+        assert self.server.requests == 3
+
+    def test_error_rate(self):
+        self.server.error_rate = 1
+        with pytest.raises(BeanBagException) as e:
+            self.nfsn.dns('example.com').serial
+        assert e.value.response.status_code == 503
+
+    def test_state_is_per_server(self):
+        self.nfsn.dns('example.com').addRR('www', 'A', '192.0.2.2')
+        with MockNfsnServer() as other:
+            assert len(other.records('example.com')) == 2
+        assert len(self.server.records('example.com')) == 3
@@ -1,8 +1,10 @@
 from beanbag.v2 import BeanBag, POST, BeanBagException
 import json
+from nfsn import nfsnbeanbag
 from nfsn.nfsnbeanbag import NfsnBeanBag
 import pytest
 import httpretty
+import requests
 
 class TestNfsnBeanbag(object):
 
@@ -59,3 +61,66 @@ class TestNfsnBeanbag(object):
             body=self.request_callback)
 
         assert POST(nfsn.dns['example.com'].listRRs)
+
+
+class TestNfsnBeanbagDecode(object):
+
+    def setup(self):
+        (self.base, _) = ~NfsnBeanBag('https://api.example.net/')
+
+    def response(self, content, status_code=200,
+                 content_type='application/x-nfsn-api'):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = content
+        if content_type is not None:
+            response.headers['content-type'] = content_type
+        return response
+
+    def test_json(self):
+        result = self.base.decode(self.response(b'{"hello": "world"}'))
+        assert result.hello == 'world'
+
+    def test_json_without_orjson(self, monkeypatch):
+        monkeypatch.setattr(nfsnbeanbag, 'orjson', None)
+        result = self.base.decode(self.response(b'[1, 2]'))
+        assert result == [1, 2]
+
+    def test_number(self):
+        assert self.base.decode(self.response(b'9.04\n')) == 9.04
+
+    def test_simple_string(self):
+        assert self.base.decode(self.response(b'Personal')) == 'Personal'
+
+    def test_empty(self):
+        assert self.base.decode(self.response(b'')) == ''
+
+    def test_unauthorized(self):
+        with pytest.raises(RuntimeError):
+            self.base.decode(self.response(b'', status_code=401))
+
+    def test_not_found(self):
+        response = self.response(b'{"error": "Not Found"}', status_code=404)
+        with pytest.raises(BeanBagException):
+            self.base.decode(response)
+
+    def test_bad_content_type(self):
+        response = self.response(b'{}', content_type='text/html')
+        with pytest.raises(BeanBagException):
+            self.base.decode(response)
+
+
+class TestNfsnBeanbagRateLimiter(object):
+
+    @httpretty.activate
+    def test_rate_limiter(self, rate_limiter):
+        api_url = 'https://api.example.net/dns/example.com/listRRs'
+        httpretty.register_uri(httpretty.POST, api_url, status=429,
+                               body='{"error": "Too Many Requests"}',
+                               content_type='application/x-nfsn-api')
+        nfsn = NfsnBeanBag('https://api.example.net/',
+                           rate_limiter=rate_limiter)
+        with pytest.raises(BeanBagException):
+            POST(nfsn.dns['example.com'].listRRs)
+        assert rate_limiter.calls == [('acquire', 'dns'),
+                                      ('observe', 'dns', 429)]
@@ -0,0 +1,58 @@
+from nfsn import Nfsn
+from nfsn.mockserver import MockNfsnServer
+from nfsn.pool import ConnectionPool
+import pytest
+import requests
+
+
+pytestmark = pytest.mark.usefixtures('real_sockets')
+
+
+class TestConnectionPool(object):
+
+    def setup(self):
+        self.server = MockNfsnServer().start()
+
+    def teardown(self):
+        self.server.stop()
+
+    def nfsn(self, pool, api_key=None):
+        return Nfsn(login=self.server.login,
+                    api_key=api_key or self.server.api_key,
+                    endpoint=self.server.url, pool=pool)
+
+    def test_adapter_settings(self):
+        pool = ConnectionPool(maxsize=32, block=True, connections=2)
+        adapter = pool.session.get_adapter('https://api.nearlyfreespeech.net')
+        assert adapter._pool_maxsize == 32
+        assert adapter._pool_block is True
+        assert adapter._pool_connections == 2
+
+    def test_default_pool(self):
+        nfsn = Nfsn(login='guest', api_key='1234567890123456')
+        assert isinstance(nfsn.pool, ConnectionPool)
+        assert nfsn.pool.session.auth is None
+
+    def test_shared_pool_with_different_credentials(self):
+        with ConnectionPool() as pool:
+            good = self.nfsn(pool)
+            bad = self.nfsn(pool, api_key='wrongkey12345678')
+            assert good.dns('example.com').serial == 1414129428
+            with pytest.raises(RuntimeError):
+                bad.dns('example.com').serial
+            assert good.dns('example.com').serial == 1414129428
+
+    def test_connections_are_reused(self):
+        with ConnectionPool() as pool:
+            for nfsn in (self.nfsn(pool), self.nfsn(pool)):
+                nfsn.dns('example.com').serial
+            adapter = pool.session.get_adapter(self.server.url)
+            pools = adapter.poolmanager.pools
+            (key,) = pools.keys()
+            assert pools[key].num_connections == 1
+
+    def test_timeout(self):
+        self.server.latency = 0.5
+        with ConnectionPool(timeout=0.05) as pool:
+            with pytest.raises(requests.exceptions.Timeout):
+                self.nfsn(pool).dns('example.com').serial
@@ -0,0 +1,115 @@
+from nfsn import ratelimit
+from nfsn.ratelimit import RateLimiter, TokenBucket
+import pytest
+
+
+class FakeClock(object):
+    """ Replace the monotonic clock and time.sleep(). """
+
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        self.slept = []
+        monkeypatch.setattr(ratelimit, '_now', lambda: self.now)
+        monkeypatch.setattr(ratelimit.time, 'sleep', self.sleep)
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(object):
+
+    def test_burst(self, monkeypatch):
+        clock = FakeClock(monkeypatch)
+        bucket = TokenBucket(rate=2, burst=3)
+        for _ in range(3):
+            bucket.acquire()
+        assert clock.slept == []
+
+    def test_waits_when_empty(self, monkeypatch):
+        clock = FakeClock(monkeypatch)
+        bucket = TokenBucket(rate=2, burst=1)
+        bucket.acquire()
+        bucket.acquire()
+        assert clock.slept == [0.5]
+
+    def test_waiting_callers_queue(self, monkeypatch):
+        FakeClock(monkeypatch)
+        bucket = TokenBucket(rate=2, burst=1)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0.5
+        assert bucket.reserve() == 1.0
+
+    def test_refill(self, monkeypatch):
+        clock = FakeClock(monkeypatch)
+        bucket = TokenBucket(rate=2, burst=1)
+        bucket.acquire()
+        clock.now += 0.5
+        bucket.acquire()
+        assert clock.slept == []
+
+
+class TestRateLimiter(object):
+
+    def test_unlimited(self, monkeypatch):
+        clock = FakeClock(monkeypatch)
+        limiter = RateLimiter()
+        for _ in range(100):
+            limiter.acquire('dns')
+        assert clock.slept == []
+        assert limiter.rate() is None
+
+    def test_per_object_type(self, monkeypatch):
+        clock = FakeClock(monkeypatch)
+        limiter = RateLimiter(rates={'dns': 1})
+        limiter.acquire('account')
+        limiter.acquire('account')
+        limiter.acquire('dns')
+        assert clock.slept == []
+        limiter.acquire('dns')
+        assert clock.slept == [1.0]
+
+    def test_unlimited_object_type(self, monkeypatch):
+        clock = FakeClock(monkeypatch)
+        limiter = RateLimiter(rates={'dns': None, 'email': 1})
+        for _ in range(10):
+            limiter.acquire('dns')
+        limiter.observe('dns', 429)
+        limiter.observe('dns', 200)
+        assert clock.slept == []
+        assert limiter.rate('dns') is None
+
+    def test_throttle_and_relax(self, monkeypatch):
+        FakeClock(monkeypatch)
+        limiter = RateLimiter(rate=8, rates={'dns': 4})
+        limiter.observe('dns', 429)
+        assert limiter.rate() == 4
+        assert limiter.rate('dns') == 2
+        limiter.observe('dns', 200)
+        assert limiter.rate() == pytest.approx(4.8)
+        assert limiter.rate('dns') == pytest.approx(2.4)
+        for _ in range(20):
+            limiter.observe('dns', 200)
+        assert limiter.rate() == 8
+        assert limiter.rate('dns') == 4
+
+    def test_server_errors_throttle(self, monkeypatch):
+        FakeClock(monkeypatch)
+        limiter = RateLimiter(rate=8)
+        limiter.observe('dns', 503)
+        limiter.observe('dns', 404)
+        assert limiter.rate() == 4
+
+    def test_min_rate(self, monkeypatch):
+        FakeClock(monkeypatch)
+        limiter = RateLimiter(rate=1, min_rate=0.5)
+        for _ in range(5):
+            limiter.throttle()
+        assert limiter.rate() == 0.5
+
+    def test_retry_after(self, monkeypatch):
+        clock = FakeClock(monkeypatch)
+        limiter = RateLimiter()
+        limiter.observe('dns', 429, {'retry-after': '3'})
+        limiter.acquire('account')
+        assert clock.slept == [3.0]
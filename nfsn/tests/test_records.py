@@ -0,0 +1,93 @@
+from beanbag.attrdict import AttrDict
+from nfsn.records import EmailForward, ResourceRecord, email_forwards, \
+    load_forwards, resource_records
+import json
+import pytest
+
+
+class TestResourceRecord(object):
+
+    rr = {'data': '192.0.2.1', 'name': '', 'scope': 'member', 'ttl': '3600',
+          'type': 'A'}
+
+    def test_from_dict(self):
+        record = ResourceRecord.from_dict(self.rr)
+        assert record == ResourceRecord('', 'A', '192.0.2.1', 3600, 'member')
+        assert record.ttl == 3600
+
+    def test_from_dict_without_ttl_or_scope(self):
+        rr = {'name': 'www', 'type': 'A', 'data': '192.0.2.2'}
+        record = ResourceRecord.from_dict(rr)
+        assert record.ttl is None
+        assert record.scope == 'member'
+
+    def test_to_dict(self):
+        assert ResourceRecord.from_dict(self.rr).to_dict() == self.rr
+
+    def test_hashable(self):
+        records = set([ResourceRecord.from_dict(self.rr),
+                       ResourceRecord.from_dict(dict(self.rr))])
+        assert len(records) == 1
+
+    def test_ordering(self):
+        a = ResourceRecord('a', 'A', '192.0.2.1', 3600, 'member')
+        b = ResourceRecord('b', 'A', '192.0.2.1', 3600, 'member')
+        assert sorted([b, a]) == [a, b]
+
+    def test_no_instance_dict(self):
+        with pytest.raises(AttributeError):
+            ResourceRecord.from_dict(self.rr).__dict__
+
+    def test_resource_records(self):
+        records = resource_records(AttrDict([self.rr]))
+        assert records == [ResourceRecord.from_dict(self.rr)]
+
+
+class TestEmailForward(object):
+
+    def test_email_forwards(self):
+        forwards = AttrDict({'hello': 'customerservice@example.net'})
+        assert email_forwards(forwards) == [
+            EmailForward('hello', 'customerservice@example.net')]
+
+    def test_attributes(self):
+        forward = EmailForward('hello', 'customerservice@example.net')
+        assert forward.forward == 'hello'
+        assert forward.dest_email == 'customerservice@example.net'
+
+
+class TestLoadForwards(object):
+
+    forwards = [EmailForward('hello', 'hello@example.net'),
+                EmailForward('sales', 'sales@example.net')]
+
+    def test_csv(self, tmpdir):
+        path = tmpdir.join('forwards.csv')
+        path.write('forward,dest_email\nhello, hello@example.net\n\n'
+                   'sales,sales@example.net\n')
+        assert load_forwards(str(path)) == self.forwards
+
+    def test_csv_without_header(self, tmpdir):
+        path = tmpdir.join('forwards.txt')
+        path.write('hello,hello@example.net\nsales,sales@example.net\n')
+        assert load_forwards(str(path)) == self.forwards
+
+    def test_bad_csv(self, tmpdir):
+        path = tmpdir.join('forwards.csv')
+        path.write('hello,hello@example.net,extra\n')
+        with pytest.raises(ValueError):
+            load_forwards(str(path))
+
+    def test_json_object(self, tmpdir):
+        path = tmpdir.join('forwards.json')
+        path.write(json.dumps({'sales': 'sales@example.net',
+                               'hello': 'hello@example.net'}))
+        assert load_forwards(str(path)) == self.forwards
+
+    def test_json_list(self, tmpdir):
+        path = tmpdir.join('forwards.JSON')
+        path.write(json.dumps([
+            ['hello', 'hello@example.net'],
+            {'forward': 'sales', 'dest_email': 'sales@example.net'},
+        ]))
+        assert load_forwards(str(path)) == self.forwards
@@ -0,0 +1,160 @@
+from beanbag.v2 import BeanBagException
+import httpretty
+from nfsn import Nfsn
+from nfsn import retry
+from nfsn.retry import RetryPolicy
+import pytest
+import requests
+
+
+class FailingFunction(object):
+    """ Raise each exception in "errors", then return "result". """
+
+    def __init__(self, errors, result='ok'):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return BeanBagException(response, 'Bad response code: %d' % status_code)
+
+
+class TestRetryPolicy(object):
+
+    @pytest.fixture(autouse=True)
+    def sleeps(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr(retry.time, 'sleep', sleeps.append)
+        return sleeps
+
+    def setup(self):
+        self.policy = RetryPolicy(attempts=3, backoff=1, max_backoff=30)
+
+    def test_success(self, sleeps):
+        function = FailingFunction([])
+        assert self.policy.call(function) == 'ok'
+        assert function.calls == 1
+        assert sleeps == []
+
+    def test_retry_server_error(self, sleeps):
+        function = FailingFunction([http_error(503), http_error(429)])
+        assert self.policy.call(function) == 'ok'
+        assert function.calls == 3
+        assert len(sleeps) == 2
+
+    def test_retry_connection_error(self):
+        error = requests.exceptions.ConnectionError()
+        function = FailingFunction([error])
+        assert self.policy.call(function) == 'ok'
+
+    def test_give_up(self):
+        function = FailingFunction([http_error(503)] * 3)
+        with pytest.raises(BeanBagException):
+            self.policy.call(function)
+        assert function.calls == 3
+
+    def test_no_retry_on_client_error(self):
+        function = FailingFunction([http_error(404)])
+        with pytest.raises(BeanBagException):
+            self.policy.call(function)
+        assert function.calls == 1
+
+    def test_no_retry_on_auth_error(self):
+        function = FailingFunction([RuntimeError('Could not authenticate')])
+        with pytest.raises(RuntimeError):
+            self.policy.call(function)
+
+    def test_non_idempotent(self):
+        function = FailingFunction([http_error(503)])
+        with pytest.raises(BeanBagException):
+            self.policy.call(function, idempotent=False)
+        assert function.calls == 1
+
+    def test_non_idempotent_connect_timeout(self):
+        error = requests.exceptions.ConnectTimeout()
+        function = FailingFunction([error])
+        assert self.policy.call(function, idempotent=False) == 'ok'
+
+    def test_check_already_applied(self):
+        function = FailingFunction([http_error(503)])
+        result = self.policy.call(function, idempotent=False,
+                                  check=lambda: True)
+        assert result == ''
+        assert function.calls == 1
+
+    def test_check_not_applied(self):
+        function = FailingFunction([http_error(503)])
+        result = self.policy.call(function, idempotent=False,
+                                  check=lambda: False)
+        assert result == 'ok'
+        assert function.calls == 2
+
+    def test_check_fails(self, sleeps):
+        error = requests.exceptions.ConnectionError()
+        function = FailingFunction([http_error(503)])
+        check = FailingFunction([error, error], result=False)
+        policy = RetryPolicy(attempts=5)
+        result = policy.call(function, idempotent=False, check=check)
+        assert result == 'ok'
+        assert (function.calls, check.calls) == (2, 3)
+        assert len(sleeps) == 3
+
+    def test_check_fails_on_last_attempt(self):
+        error = requests.exceptions.ConnectionError()
+        function = FailingFunction([http_error(503)])
+        check = FailingFunction([error] * 3, result=False)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            self.policy.call(function, idempotent=False, check=check)
+        assert check.calls == 2
+
+    def test_delay_is_capped(self):
+        for attempt in range(1, 20):
+            assert 0 <= self.policy.delay(attempt) <= 30
+
+
+class TestNfsnRetry(object):
+
+    @httpretty.activate
+    def test_each_attempt_is_signed_again(self, monkeypatch):
+        monkeypatch.setattr(retry.time, 'sleep', lambda seconds: None)
+        headers = []
+        def callback(request, uri, response_headers):
+            headers.append(request.headers['X-NFSN-Authentication'])
+            response_headers['content-type'] = 'application/x-nfsn-api'
+            if len(headers) == 1:
+                return (503, response_headers, '{"error": "Unavailable"}')
+            return (200, response_headers, '1414129428')
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://api.nearlyfreespeech.net/dns/example.com/serial',
+            body=callback)
+        nfsn = Nfsn(login='guest', api_key='1234567890123456', retry=True)
+        assert nfsn.dns('example.com').serial == 1414129428
+        assert len(headers) == 2
+        assert headers[0] != headers[1]
+
+    @httpretty.activate
+    def test_add_rr_checks_state_before_retrying(self, monkeypatch):
+        monkeypatch.setattr(retry.time, 'sleep', lambda seconds: None)
+        api = 'https://api.nearlyfreespeech.net/dns/example.com/'
+        httpretty.register_uri(httpretty.POST, api + 'addRR', status=503,
+                               body='{"error": "Unavailable"}',
+                               content_type='application/x-nfsn-api')
+        # The first attempt went through after all:
+        httpretty.register_uri(
+            httpretty.POST, api + 'listRRs',
+            body='[{"name": "testing", "type": "A", "data": "192.0.2.2",'
+                 ' "ttl": "3600", "scope": "member"}]',
+            content_type='application/x-nfsn-api')
+        nfsn = Nfsn(login='guest', api_key='1234567890123456', retry=True)
+        result = nfsn.dns('example.com').addRR('testing', 'A', '192.0.2.2')
+        assert result == ''
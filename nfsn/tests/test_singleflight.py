@@ -0,0 +1,163 @@
+import nfsn as nfsn_module
+from nfsn import Nfsn
+from nfsn.mockserver import MockNfsnServer
+from nfsn.singleflight import SingleFlight
+import pytest
+import threading
+
+
+pytestmark = pytest.mark.usefixtures('real_sockets')
+
+
+class BlockingFunction(object):
+    """ Count the calls, and block each one until release(). """
+
+    def __init__(self, result='ok', error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.released.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def release(self):
+        self.released.set()
+
+
+def run_threads(count, target):
+    """ Run target() in "count" threads, and return the outcomes. """
+    outcomes = [None] * count
+    def run(i):
+        try:
+            outcomes[i] = target()
+        except Exception as e:
+            outcomes[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return (threads, outcomes)
+
+
+def wait_for_waiters(flight, count):
+    """ Wait until "count" threads have joined the call in flight. """
+    for _ in range(500):
+        if flight.shared >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError('threads did not join the call')
+
+
+class TestSingleFlight(object):
+
+    def setup(self):
+        self.flight = SingleFlight()
+
+    def test_concurrent_calls_share_one_call(self):
+        function = BlockingFunction()
+        (threads, outcomes) = run_threads(
+            5, lambda: self.flight.do('key', function))
+        wait_for_waiters(self.flight, 4)
+        function.release()
+        for thread in threads:
+            thread.join()
+        assert outcomes == ['ok'] * 5
+        assert function.calls == 1
+
+    def test_errors_are_shared(self):
+        function = BlockingFunction(error=ValueError('boom'))
+        (threads, outcomes) = run_threads(
+            3, lambda: self.flight.do('key', function))
+        wait_for_waiters(self.flight, 2)
+        function.release()
+        for thread in threads:
+            thread.join()
+        assert [type(outcome) for outcome in outcomes] == [ValueError] * 3
+        assert function.calls == 1
+
+    def test_sequential_calls_are_not_cached(self):
+        function = BlockingFunction()
+        function.release()
+        self.flight.do('key', function)
+        self.flight.do('key', function)
+        assert function.calls == 2
+
+    def test_different_keys(self):
+        function = BlockingFunction()
+        function.release()
+        self.flight.do(('dns', 'example.com', 'serial', ()), function)
+        self.flight.do(('dns', 'example.net', 'serial', ()), function)
+        assert function.calls == 2
+
+    def test_forget(self):
+        key = ('dns', 'example.com', 'serial', ())
+        first = BlockingFunction(result='old')
+        (threads, outcomes) = run_threads(
+            1, lambda: self.flight.do(key, first))
+        first.started.wait(5)
+        self.flight.forget('dns', 'example.com')
+        second = BlockingFunction(result='new')
+        second.release()
+        assert self.flight.do(key, second) == 'new'
+        first.release()
+        threads[0].join()
+        assert outcomes == ['old']
+
+
+class TestNfsnCoalesce(object):
+
+    def setup(self):
+        self.server = MockNfsnServer(latency=0.2).start()
+
+    def teardown(self):
+        self.server.stop()
+
+    def nfsn(self, coalesce):
+        return Nfsn(login=self.server.login, api_key=self.server.api_key,
+                    endpoint=self.server.url, coalesce=coalesce)
+
+    def test_identical_reads_share_a_request(self, monkeypatch):
+        nfsn = self.nfsn(coalesce=True)
+        handle = self.server.handle
+        def handle_when_shared(*args):
+            # Only answer once the other three calls are waiting for this one.
+            wait_for_waiters(nfsn.coalesce, 3)
+            return handle(*args)
+        monkeypatch.setattr(self.server, 'handle', handle_when_shared)
+        calls = [(i, lambda: nfsn.dns('example.com').listRRs(name=''))
+                 for i in range(4)]
+        results = list(nfsn.batch(calls).values())
+        assert len(results[0]) == 2
+        assert results == [results[0]] * 4
+        assert self.server.requests == 1
+
+    def test_different_reads(self):
+        nfsn = self.nfsn(coalesce=True)
+        results = nfsn.batch([
+            ('serial', lambda: nfsn.dns('example.com').serial),
+            ('expire', lambda: nfsn.dns('example.com').expire),
+        ])
+        assert list(results.values()) == [1414129428, 86400]
+        assert self.server.requests == 2
+
+    def test_different_methods(self):
+        nfsn = self.nfsn(coalesce=True)
+        dns = nfsn.dns('example.com')
+        nfsn.batch([
+            ('get', lambda: dns._request(nfsn_module._GET, 'listRRs')),
+            ('post', lambda: dns._request(nfsn_module._POST, 'listRRs')),
+        ])
+        assert self.server.requests == 2
+
+    def test_without_coalescing(self):
+        nfsn = self.nfsn(coalesce=None)
+        calls = [(i, lambda: nfsn.dns('example.com').serial)
+                 for i in range(3)]
+        nfsn.batch(calls)
+        assert self.server.requests == 3
@@ -0,0 +1,199 @@
+from nfsn import Nfsn
+from nfsn.mockserver import MockNfsnServer
+from nfsn.records import ResourceRecord
+from nfsn.snapshot import Change, Snapshot, changes
+import pytest
+
+
+pytestmark = pytest.mark.usefixtures('real_sockets')
+
+
+class TestSnapshot(object):
+
+    def setup(self):
+        self.server = MockNfsnServer().start()
+        self.nfsn = Nfsn(login=self.server.login,
+                         api_key=self.server.api_key,
+                         endpoint=self.server.url)
+
+    def teardown(self):
+        self.server.stop()
+
+    def test_crawl(self):
+        snapshot = self.nfsn.snapshot('guest', domains=['example.com'])
+        assert snapshot.login == 'guest'
+        assert snapshot.accounts == {
+            'A1B2-C3D4E5F6': {
+                'balance': 9.04,
+                'friendlyName': 'Personal',
+                'sites': ['coolsite', 'anothercoolsite'],
+                'status': {'color': '#00b000', 'short': 'OK',
+                           'status': 'Ok'},
+            },
+        }
+        assert snapshot.sites == ['anothercoolsite', 'coolsite']
+        assert snapshot.dns['example.com']['serial'] == 1414129428
+        assert snapshot.dns['example.com']['records'] == [
+            ResourceRecord('', 'A', '192.0.2.1', 3600, 'member'),
+            ResourceRecord('', 'NS', 'ns.phx2.nearlyfreespeech.net.', 3600,
+                           'member'),
+        ]
+        assert snapshot.email == {
+            'example.com': {'hello': 'customerservice@example.net'}}
+        assert snapshot.errors == {}
+
+    def test_each_call_is_made_once(self):
+        self.nfsn.snapshot('guest', domains=['example.com', 'example.com'])
+        # member accounts and sites, the serial, listRRs, listForwards, and
+        # four account properties.
+        assert self.server.requests == 9
+
+    def test_errors(self):
+        snapshot = self.nfsn.snapshot('guest',
+                                      domains=['example.com', 'missing.com'],
+                                      email_domains=[])
+        assert sorted(snapshot.dns) == ['example.com']
+        assert snapshot.email == {}
+        assert list(snapshot.errors) == ['dns/missing.com/serial']
+
+    def test_save_and_load(self, tmpdir):
+        snapshot = self.nfsn.snapshot('guest', domains=['example.com'])
+        filename = str(tmpdir.join('inventory.json.gz'))
+        snapshot.save(filename)
+        loaded = Snapshot.load(filename)
+        assert loaded == snapshot
+        assert loaded.dns['example.com']['records'][0].ttl == 3600
+
+    def test_unknown_version(self):
+        with pytest.raises(ValueError):
+            Snapshot.from_dict({'version': 99})
+
+
+class TestRefresh(object):
+
+    def setup(self):
+        self.server = MockNfsnServer().start()
+        self.nfsn = Nfsn(login=self.server.login,
+                         api_key=self.server.api_key,
+                         endpoint=self.server.url)
+        self.snapshot = self.nfsn.snapshot('guest', domains=['example.com'])
+        self.server.requests = 0
+
+    def teardown(self):
+        self.server.stop()
+
+    def test_unchanged(self):
+        (snapshot, feed) = self.snapshot.refresh(self.nfsn)
+        assert feed == []
+        assert snapshot.dns == self.snapshot.dns
+        # Everything but listRRs
+        assert self.server.requests == 8
+
+    def test_changed_zone(self):
+        dns = self.nfsn.dns('example.com')
+        dns.addRR('www', 'A', '192.0.2.2')
+        dns.updateSerial()
+        self.server.requests = 0
+        (snapshot, feed) = self.snapshot.refresh(self.nfsn)
+        assert self.server.requests == 9
+        assert snapshot.dns['example.com']['serial'] == 1414129429
+        www = ResourceRecord('www', 'A', '192.0.2.2', 3600, 'member')
+        assert feed == [
+            Change('dns', 'example.com', 'added', ('www', 'A', '192.0.2.2'),
+                   None, www),
+        ]
+
+    def test_zone_change_without_new_serial(self):
+        # Without updateSerial(), we do not notice.
+        self.nfsn.dns('example.com').addRR('www', 'A', '192.0.2.2')
+        (_, feed) = self.snapshot.refresh(self.nfsn)
+        assert feed == []
+
+    def test_changed_forwards(self):
+        email = self.nfsn.email('example.com')
+        email.setForward('hello', 'hello@example.org')
+        email.setForward('sales', 'sales@example.org')
+        (_, feed) = self.snapshot.refresh(self.nfsn)
+        assert feed == [
+            Change('email', 'example.com', 'modified', 'hello',
+                   'customerservice@example.net', 'hello@example.org'),
+            Change('email', 'example.com', 'added', 'sales', None,
+                   'sales@example.org'),
+        ]
+
+    def test_failed_calls_are_not_removals(self):
+        # With one worker, the first calls are the member's accounts and
+        # sites, and the zone's serial.
+        self.server.inject_errors(503, 503, 503)
+        (snapshot, feed) = self.snapshot.refresh(self.nfsn, max_workers=1)
+        assert sorted(snapshot.errors) == ['dns/example.com/serial',
+                                           'member/guest/accounts',
+                                           'member/guest/sites']
+        assert feed == []
+        assert snapshot.accounts == self.snapshot.accounts
+        assert snapshot.sites == self.snapshot.sites
+        assert snapshot.dns == self.snapshot.dns
+
+    def test_previous_from_file(self, tmpdir):
+        filename = str(tmpdir.join('inventory.json.gz'))
+        self.snapshot.save(filename)
+        previous = Snapshot.load(filename)
+        snapshot = self.nfsn.snapshot('guest', domains=['example.com'],
+                                      previous=previous)
+        assert changes(previous, snapshot) == []
+        assert self.server.requests == 8
+
+
+class TestChanges(object):
+
+    def snapshot(self, **kwargs):
+        return Snapshot('guest', taken=0, **kwargs)
+
+    def test_sites(self):
+        old = self.snapshot(sites=['a', 'b'])
+        new = self.snapshot(sites=['b', 'c'])
+        assert [(c.change, c.key) for c in changes(old, new)] == [
+            ('removed', 'a'), ('added', 'c')]
+
+    def test_accounts(self):
+        old = self.snapshot(accounts={'A': {'balance': 1.0},
+                                      'B': {'balance': 2.0}})
+        new = self.snapshot(accounts={'A': {'balance': 0.5},
+                                      'C': {'balance': 3.0}})
+        assert changes(old, new) == [
+            Change('account', 'A', 'modified', 'balance', 1.0, 0.5),
+            Change('account', 'B', 'removed', None, {'balance': 2.0}, None),
+            Change('account', 'C', 'added', None, None, {'balance': 3.0}),
+        ]
+
+    def test_errors_are_not_removals(self):
+        record = ResourceRecord('www', 'A', '192.0.2.1', 3600, 'member')
+        old = self.snapshot(
+            accounts={'A': {'balance': 1.0}}, sites=['a'],
+            dns={'example.com': {'serial': 1, 'records': [record]}},
+            email={'example.com': {'hello': 'hello@example.net'}})
+        errors = {'member/guest/accounts': 'HTTP 503',
+                  'dns/example.com/listRRs': 'HTTP 503',
+                  'email/example.com/listForwards': 'HTTP 503'}
+        new = self.snapshot(errors=errors)
+        assert changes(old, new) == []
+
+    def test_failed_account_property(self):
+        old = self.snapshot(accounts={'A': {'balance': 1.0, 'sites': []}})
+        new = self.snapshot(accounts={'A': {'sites': []}},
+                            errors={'account/A/balance': 'HTTP 503'})
+        assert changes(old, new) == []
+
+    def test_modified_record(self):
+        before = ResourceRecord('www', 'A', '192.0.2.1', 3600, 'member')
+        after = ResourceRecord('www', 'A', '192.0.2.1', 300, 'member')
+        old = self.snapshot(dns={'example.com': {'serial': 1,
+                                                 'records': [before]}})
+        new = self.snapshot(dns={'example.com': {'serial': 2,
+                                                 'records': [after]}})
+        (change,) = changes(old, new)
+        assert change.change == 'modified'
+        assert change.to_dict() == {
+            'object_name': 'dns', 'object_id': 'example.com',
+            'change': 'modified', 'key': ('www', 'A', '192.0.2.1'),
+            'old': before, 'new': after}
@@ -0,0 +1,97 @@
+from beanbag.v2 import BeanBagException
+from nfsn import Nfsn
+from nfsn.mockserver import MockNfsnServer
+from nfsn.transport import DirectTransport
+import pytest
+
+
+pytestmark = pytest.mark.usefixtures('real_sockets')
+
+
+class TestDirectTransport(object):
+
+    def setup(self):
+        self.server = MockNfsnServer().start()
+
+    def teardown(self):
+        self.server.stop()
+
+    def nfsn(self, transport='direct', **kwargs):
+        kwargs.setdefault('api_key', self.server.api_key)
+        return Nfsn(login=self.server.login, endpoint=self.server.url,
+                    transport=transport, **kwargs)
+
+    def test_transport(self):
+        assert isinstance(self.nfsn().transport, DirectTransport)
+        assert not isinstance(self.nfsn(None).transport, DirectTransport)
+
+    def test_unknown_transport(self):
+        with pytest.raises(ValueError):
+            self.nfsn('carrier-pigeon')
+
+    def test_same_results(self):
+        results = []
+        for transport in (None, 'direct'):
+            nfsn = self.nfsn(transport)
+            dns = nfsn.dns('example.com')
+            results.append((dns.serial, dns.listRRs(type='A'),
+                            list(dns.iter_rrs(as_records=True)),
+                            nfsn.email('example.com').listForwards(),
+                            nfsn.account('A1B2-C3D4E5F6').balance))
+        assert results[0] == results[1]
+
+    def test_changes(self):
+        dns = self.nfsn().dns('example.com')
+        dns.addRR('www', 'A', '192.0.2.2', ttl=300)
+        assert +dns.listRRs(name='www') == [
+            {'name': 'www', 'type': 'A', 'data': '192.0.2.2', 'ttl': '300',
+             'scope': 'member'}]
+        dns.expire = 86401
+        assert dns.expire == 86401
+
+    def test_bad_api_key(self):
+        nfsn = self.nfsn(api_key='wrongkey12345678')
+        with pytest.raises(RuntimeError):
+            nfsn.dns('example.com').serial
+
+    def test_not_found(self):
+        with pytest.raises(BeanBagException) as e:
+            self.nfsn().account('no-such-account').balance
+        assert e.value.response.status_code == 404
+
+    def test_rate_limiter(self, rate_limiter):
+        self.nfsn(rate_limiter=rate_limiter).dns('example.com').serial
+        assert rate_limiter.calls == [('acquire', 'dns'),
+                                      ('observe', 'dns', 200)]
+
+    def test_signs_after_rate_limiting(self, rate_limiter):
+        nfsn = self.nfsn(rate_limiter=rate_limiter)
+        header = nfsn.transport.auth.header
+        def sign(*args):
+            rate_limiter.calls.append(('sign',))
+            return header(*args)
+        nfsn.transport.auth.header = sign
+        nfsn.dns('example.com').serial
+        assert rate_limiter.calls[:2] == [('acquire', 'dns'), ('sign',)]
+
+    def test_metrics(self):
+        nfsn = self.nfsn(metrics=True)
+        nfsn.dns('example.com').listRRs(name='')
+        stats = nfsn.metrics.as_dict()['dns']['listRRs']
+        assert stats['requests'] == 1
+        assert stats['bytes_out'] == len('name=')
+        assert stats['bytes_in'] > 0
+
+    def test_endpoint_with_path(self):
+        transport = DirectTransport('https://example.net/api', session=None)
+        assert transport.base_url == 'https://example.net/api/'
+        assert transport._base_path == '/api/'
+
+    def test_encode(self):
+        transport = DirectTransport(self.server.url, session=None)
+        assert transport.encode(None) == (None, None)
+        assert transport.encode(86400) == (b'86400', None)
+        assert transport.encode({'name': 'www', 'ttl': 300}) in [
+            (b'name=www&ttl=300', 'application/x-www-form-urlencoded'),
+            (b'ttl=300&name=www', 'application/x-www-form-urlencoded'),
+        ]
@@ -0,0 +1,86 @@
+from nfsn.records import ResourceRecord
+from nfsn.zone import Zone
+
+
+def rr(name, type, data, ttl=3600):
+    return ResourceRecord(name, type, data, ttl, 'member')
+
+
+class DummyNfsnDns(object):
+    """ Filters listRRs() by name and type, like NFSN does. """
+
+    def __init__(self, records):
+        self.records = records
+
+    def listRRs(self, name=None, type=None, data=None):
+        return [record.to_dict() for record in self.records
+                if (name is None or record.name == name) and
+                (type is None or record.type == type)]
+
+
+class TestZone(object):
+
+    def setup(self):
+        self.apex = rr('', 'A', '192.0.2.1')
+        self.www = rr('www', 'A', '192.0.2.1')
+        self.www6 = rr('www', 'AAAA', '2001:db8::1')
+        self.mx = rr('', 'MX', '10 mail.example.com.')
+        self.zone = Zone([self.apex, self.www, self.www6, self.mx])
+
+    def test_len(self):
+        assert len(self.zone) == 4
+
+    def test_from_dicts(self):
+        zone = Zone([self.www.to_dict()])
+        assert self.www in zone
+
+    def test_find_by_name(self):
+        assert self.zone.find(name='www') == set([self.www, self.www6])
+
+    def test_find_by_type(self):
+        assert self.zone.find(type='A') == set([self.apex, self.www])
+
+    def test_find_by_name_and_type(self):
+        assert self.zone.find(name='', type='MX') == set([self.mx])
+
+    def test_find_missing(self):
+        assert self.zone.find(name='nope') == set()
+
+    def test_contains_name_type(self):
+        assert ('www', 'AAAA') in self.zone
+        assert ('www', 'MX') not in self.zone
+
+    def test_names_and_types(self):
+        assert self.zone.names() == set(['', 'www'])
+        assert self.zone.types() == set(['A', 'AAAA', 'MX'])
+
+    def test_discard_updates_indexes(self):
+        self.zone.discard(self.www6)
+        assert ('www', 'AAAA') not in self.zone
+        assert 'AAAA' not in self.zone.types()
+        assert self.zone.find(name='www') == set([self.www])
+
+    def test_diff(self):
+        other = Zone([self.apex, rr('mail', 'A', '192.0.2.9')])
+        (removed, added) = self.zone.diff(other)
+        assert removed == set([self.www, self.www6, self.mx])
+        assert added == set([rr('mail', 'A', '192.0.2.9')])
+
+    def test_set_operations(self):
+        other = Zone([self.apex, rr('mail', 'A', '192.0.2.9')])
+        assert len(self.zone | other) == 5
+        assert (self.zone & other) == Zone([self.apex])
+        assert (self.zone - other).find(name='') == set([self.mx])
+
+    def test_refresh(self):
+        changed = rr('www', 'A', '192.0.2.7')
+        dns = DummyNfsnDns([self.apex, changed, self.www6, self.mx])
+        (removed, added) = self.zone.refresh(dns, name='www', type='A')
+        assert removed == set([self.www])
+        assert added == set([changed])
+        assert self.zone.find(name='www') == set([changed, self.www6])
+        assert len(self.zone) == 4
+
+    def test_from_dns(self):
+        dns = DummyNfsnDns([self.apex, self.mx])
+        assert Zone.from_dns(dns) == Zone([self.apex, self.mx])
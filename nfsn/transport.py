@@ -0,0 +1,110 @@
+""" Make API requests with requests directly, without BeanBag. """
+from .nfsnbeanbag import decode_response, iter_items, timed_request
+from functools import partial
+from requests import Request
+try:
+    from urllib.parse import urlencode, urlsplit
+except ImportError:
+    # Python 2
+    from urllib import urlencode
+    from urlparse import urlsplit
+
+_FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+
+class DirectTransport(object):
+    """ Sends NfsnObject calls straight to a requests.Session.
+
+    This does the same job as NfsnBeanBag, with the same results and
+    errors, but it builds each URL and form body itself and signs it with
+    NfsnAuth.header(), rather than going through BeanBag's Request objects
+    and the requests auth hook. It has the interface that NfsnObject uses:
+    encode(), make_request(), decode() and stream().
+
+    It reads the proxy settings (eg. $HTTPS_PROXY) the first time it makes a
+    request, rather than for every request, so later changes to them have no
+    effect.
+
+    :Example:
+    >>> nfsn = Nfsn(transport='direct')
+    """
+
+    def __init__(self, base_url, session, rate_limiter=None, metrics=None,
+                 auth=None, timeout=None):
+        self.base_url = base_url.rstrip('/') + '/'
+        # The path that we sign, eg. "/dns/example.com/listRRs", is this
+        # plus the path for the call.
+        self._base_path = urlsplit(self.base_url).path
+        self.session = session
+        # Optional nfsn.ratelimit.RateLimiter
+        self.rate_limiter = rate_limiter
+        # Optional nfsn.metrics.Metrics
+        self.metrics = metrics
+        # NfsnAuth (or None, to send unsigned requests)
+        self.auth = auth
+        self.timeout = timeout
+        # Session.send() keyword arguments, for streamed and other requests
+        self._send_settings = {}
+
+    def encode(self, body):
+        """ Return a (data, content_type) tuple for a call's "body": a dict
+        of form parameters, a property value, or None. """
+        if body is None:
+            return (None, None)
+        if isinstance(body, dict):
+            return (urlencode(body, doseq=True).encode('utf-8'),
+                    _FORM_CONTENT_TYPE)
+        if not isinstance(body, (bytes, type(u''))):
+            body = str(body)
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        return (body, None)
+
+    def make_request(self, path, verb, request, stream=False):
+        """ Sign and send a request for a (path, params) tuple, eg.
+        ("dns/example.com/listRRs", {}), and an encode()d body. Return the
+        requests.Response. """
+        (url, params) = path
+        (data, content_type) = request
+        # Wait for the rate limiter before signing, so that the signature's
+        # timestamp is fresh.
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url.split('/', 1)[0])
+        headers = {'Accept': 'application/json'}
+        if content_type is not None:
+            headers['Content-Type'] = content_type
+        if self.auth is not None:
+            headers['X-NFSN-Authentication'] = self.auth.header(
+                self._base_path + url, data)
+        session = self.session
+        prepared = session.prepare_request(Request(
+            verb, self.base_url + url, headers=headers, data=data,
+            params=params))
+        send = partial(session.send, prepared, **self._settings(stream))
+        if self.metrics is None:
+            return send()
+        return timed_request(self.metrics, verb, url, send, stream)
+
+    def _settings(self, stream):
+        """ Return the keyword arguments for Session.send(). Every request
+        goes to the same host, so unlike Session.request(), we only read the
+        proxy and certificate settings (from the session and the
+        environment) once, rather than on every call. """
+        settings = self._send_settings.get(stream)
+        if settings is None:
+            settings = self.session.merge_environment_settings(
+                self.base_url, {}, stream, None, None)
+            settings['timeout'] = self.timeout
+            settings['allow_redirects'] = True
+            self._send_settings[stream] = settings
+        return settings
+
+    def decode(self, response):
+        return decode_response(response, self.rate_limiter)
+
+    def stream(self, path, verb, body=None, pairs=False):
+        """ Like NfsnBeanBag.stream(). """
+        response = self.make_request(path, verb, self.encode(body),
+                                     stream=True)
+        for item in iter_items(self, response, pairs):
+            yield item
@@ -0,0 +1,135 @@
+""" An indexed, in-memory view of a DNS zone's resource records. """
+from .records import ResourceRecord, resource_records
+
+
+class Zone(object):
+    """ A set of ResourceRecords, indexed by name, by type, and by (name,
+    type), so lookups do not scan every record.
+
+    :Example:
+    >>> zone = nfsn.dns('example.com').zone()
+    >>> zone.find(name='www', type='A')
+    >>> ('www', 'A') in zone
+    >>> zone - other_zone  # records in zone but not in other_zone
+    """
+
+    def __init__(self, records=()):
+        self._records = set()
+        self._by_name = {}
+        self._by_type = {}
+        self._by_name_type = {}
+        for record in records:
+            self.add(record)
+
+    @classmethod
+    def from_dns(cls, dns):
+        """ Fetch all the records for an NfsnDns object. """
+        return cls(resource_records(dns.listRRs()))
+
+    def add(self, record):
+        if not isinstance(record, ResourceRecord):
+            record = ResourceRecord.from_dict(record)
+        if record in self._records:
+            return
+        self._records.add(record)
+        self._by_name.setdefault(record.name, set()).add(record)
+        self._by_type.setdefault(record.type, set()).add(record)
+        key = (record.name, record.type)
+        self._by_name_type.setdefault(key, set()).add(record)
+
+    def discard(self, record):
+        if not isinstance(record, ResourceRecord):
+            record = ResourceRecord.from_dict(record)
+        if record not in self._records:
+            return
+        self._records.discard(record)
+        for (index, key) in ((self._by_name, record.name),
+                             (self._by_type, record.type),
+                             (self._by_name_type, (record.name, record.type))):
+            index[key].discard(record)
+            if not index[key]:
+                del index[key]
+
+    def find(self, name=None, type=None):
+        """ Return the set of records with this name and/or type. """
+        if name is not None and type is not None:
+            found = self._by_name_type.get((name, type))
+        elif name is not None:
+            found = self._by_name.get(name)
+        elif type is not None:
+            found = self._by_type.get(type)
+        else:
+            found = self._records
+        return set(found or ())
+
+    def names(self):
+        return set(self._by_name)
+
+    def types(self):
+        return set(self._by_type)
+
+    def refresh(self, dns, name=None, type=None):
+        """ Re-fetch the records with this name and/or type from an NfsnDns
+        object, and replace only those records. With no name or type,
+        re-fetch everything. Returns a (removed, added) tuple of record
+        sets. """
+        old = self.find(name=name, type=type)
+        new = set(resource_records(dns.listRRs(name=name, type=type)))
+        # NFSN matches the "name" and "type" filters loosely, so only keep
+        # the records we asked for.
+        new = set(record for record in new
+                  if (name is None or record.name == name) and
+                  (type is None or record.type == type))
+        for record in old - new:
+            self.discard(record)
+        for record in new - old:
+            self.add(record)
+        return (old - new, new - old)
+
+    def diff(self, other):
+        """ Return a (removed, added) tuple of record sets that turn this
+        zone into "other". """
+        return (self._records - other._records,
+                other._records - self._records)
+
+    def union(self, other):
+        return Zone(self._records | other._records)
+
+    def intersection(self, other):
+        return Zone(self._records & other._records)
+
+    def difference(self, other):
+        return Zone(self._records - other._records)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __contains__(self, item):
+        """ Test for a ResourceRecord, or for any record with a (name, type)
+        pair. """
+        if isinstance(item, ResourceRecord):
+            return item in self._records
+        return item in self._by_name_type
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __eq__(self, other):
+        if not isinstance(other, Zone):
+            return NotImplemented
+        return self._records == other._records
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<Zone(%d records)>' % len(self._records)
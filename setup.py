@@ -24,6 +24,14 @@ class PyTest(TestCommand):
         errno = pytest.main('nfsn/tests ' + self.pytest_args)
         sys.exit(errno)
 
+install_requires = [
+    'beanbag',
+    'requests',
+]
+if sys.version_info < (3, 2):
+    # concurrent.futures backport
+    install_requires.append('futures')
+
 setup(name='python-nfsn',
       version=metadata['version'],
       description=("Interact with NearlyFreeSpeech's API"),
@@ -39,10 +47,14 @@ setup(name='python-nfsn',
       url='https://github.com/ktdreyer/python-nfsn',
       license='License :: CC0 1.0 Universal (CC0 1.0) Public Domain Dedication',
       packages=find_packages(),
-      install_requires=[
-          'beanbag',
-          'requests',
-      ],
+      # nfsn.mockserver serves these fixtures.
+      package_data={'nfsn.tests': ['fixtures/responses/*/*/*']},
+      install_requires=install_requires,
+      extras_require={
+          'async': ['aiohttp'],
+          'speedups': ['orjson'],
+          'streaming': ['ijson'],
+      },
       entry_points={
         'console_scripts': [
             'pynfsn = nfsn.cli:main',